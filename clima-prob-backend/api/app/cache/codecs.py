@@ -0,0 +1,69 @@
+import io
+import json
+from typing import Dict
+
+import numpy as np
+import orjson
+import pandas as pd
+
+from ..utils.serialize import dumps_json
+
+# Formatos compactos (sin pickle): un DataFrame numérico viaja como npz con
+# índice int64 (ns UTC), bloque float64 y metadata JSON.
+
+
+def encode_frame(df: pd.DataFrame) -> bytes:
+    idx = pd.DatetimeIndex(df.index)
+    meta = {
+        "columns": [str(c) for c in df.columns],
+        "tz": str(idx.tz) if idx.tz is not None else None,
+        "index_name": idx.name,
+        "attrs": {k: v for k, v in df.attrs.items() if isinstance(v, (bool, int, float, str, type(None)))},
+    }
+    buf = io.BytesIO()
+    np.savez(
+        buf,
+        index=idx.asi8,
+        values=df.to_numpy(dtype=np.float64),
+        meta=np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8),
+    )
+    return buf.getvalue()
+
+
+def decode_frame(data: bytes) -> pd.DataFrame:
+    with np.load(io.BytesIO(data), allow_pickle=False) as z:
+        meta = json.loads(z["meta"].tobytes())
+        idx = pd.DatetimeIndex(z["index"].view("datetime64[ns]"), name=meta["index_name"])
+        values = z["values"]
+    if meta["tz"]:
+        idx = idx.tz_localize("UTC").tz_convert(meta["tz"])
+    df = pd.DataFrame(values, index=idx, columns=meta["columns"])
+    df.attrs = meta["attrs"]
+    return df
+
+
+def encode_arrays(arrays: Dict[str, np.ndarray]) -> bytes:
+    buf = io.BytesIO()
+    np.savez(buf, **{k: np.asarray(v, dtype=np.float64) for k, v in arrays.items()})
+    return buf.getvalue()
+
+
+def decode_arrays(data: bytes) -> Dict[str, np.ndarray]:
+    with np.load(io.BytesIO(data), allow_pickle=False) as z:
+        return {k: z[k] for k in z.files}
+
+
+def encode_json(obj) -> bytes:
+    return dumps_json(obj)
+
+
+def decode_json(data: bytes):
+    return orjson.loads(data)
+
+
+CODECS = {
+    "frame": (encode_frame, decode_frame),
+    "arrays": (encode_arrays, decode_arrays),
+    "json": (encode_json, decode_json),
+    "bytes": (bytes, bytes),
+}
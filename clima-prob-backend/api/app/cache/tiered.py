@@ -0,0 +1,305 @@
+import hashlib
+import logging
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..config.settings import settings
+from ..utils.deadline import Deadline
+from .codecs import CODECS
+
+try:
+    import redis
+except ImportError:  # pragma: no cover
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Namespace:
+    """TTL, versión y formato de un tipo de entrada. Subir ``version`` invalida todo el namespace."""
+    ttl_s: int
+    codec: str
+    version: int = 1
+
+
+def default_namespaces() -> Dict[str, Namespace]:
+    return {
+        "series": Namespace(settings.SERIES_STALE_TTL_S, "frame"),
+        "dataset": Namespace(settings.SERIES_STALE_TTL_S, "frame"),
+        "dataset_digest": Namespace(settings.SERIES_STALE_TTL_S, "bytes"),
+        "thresholds": Namespace(settings.CACHE_TTL, "json"),
+        "ecdf": Namespace(settings.CACHE_TTL, "arrays"),
+        "response": Namespace(settings.RESPONSE_CACHE_TTL_S, "bytes"),
+    }
+
+
+def _nbytes(value) -> int:
+    """Tamaño aproximado en memoria de un valor ya decodificado."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True).sum())
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict) and all(isinstance(v, np.ndarray) for v in value.values()):
+        return sum(v.nbytes for v in value.values())
+    return sys.getsizeof(value)
+
+
+class _L1:
+    """LRU en proceso con expiración por entrada (objetos ya decodificados), acotado en bytes."""
+
+    def __init__(self, max_bytes: int, max_entry: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.max_entry = max_entry or max_bytes
+        self.nbytes = 0
+        self._d: "OrderedDict[str, Tuple[float, Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._d.get(key)
+            if item is None:
+                return None
+            expires_at, value, size = item
+            if expires_at <= time.time():
+                del self._d[key]
+                self.nbytes -= size
+                return None
+            self._d.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl_s: float, size: Optional[int] = None) -> None:
+        size = _nbytes(value) if size is None else size
+        with self._lock:
+            old = self._d.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[2]
+            if size > self.max_entry:
+                return
+            self._d[key] = (time.time() + ttl_s, value, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, _, freed) = self._d.popitem(last=False)
+                self.nbytes -= freed
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            old = self._d.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[2]
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        now = time.time()
+        with self._lock:
+            snapshot = list(self._d.items())
+        for k, (exp, v, _) in snapshot:
+            if exp > now:
+                yield k, v
+
+
+class TwoTierCache:
+    """
+    Caché de dos niveles: L1 = LRU por proceso acotado en bytes, L2 = Redis compartido
+    entre workers/instancias (opcional; sin ``redis_client`` solo hay L1).
+    Las claves llevan versión global + versión del namespace. ``get_or_set``
+    evita estampidas: un solo cálculo por clave, con espera local y lock en Redis.
+    Los fallos de Redis se registran y degradan a L1, nunca rompen la petición.
+    """
+
+    def __init__(self, redis_client=None, namespaces: Optional[Dict[str, Namespace]] = None,
+                 l1_bytes: Optional[int] = None, prefix: str = "climaprob", version: Optional[int] = None):
+        self.redis = redis_client
+        self.namespaces = namespaces or default_namespaces()
+        l1_bytes = l1_bytes or settings.CACHE_L1_MAX_MB * 1024 * 1024
+        # Con Redis, los valores grandes (datasets largos) viven solo en L2 y no
+        # desalojan del L1 a todo lo demás
+        self.l1 = _L1(l1_bytes, l1_bytes // 4 if redis_client is not None else None)
+        self.prefix = prefix
+        self.version = settings.CACHE_VERSION if version is None else version
+        self._inflight: Dict[str, threading.Event] = {}
+        self._inflight_lock = threading.Lock()
+
+    # -- claves ------------------------------------------------------------
+
+    def key(self, ns: str, parts) -> str:
+        spec = self.namespaces[ns]
+        digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:32]
+        return f"{self.prefix}:v{self.version}:{ns}:v{spec.version}:{digest}"
+
+    def ns_pattern(self, ns: str) -> str:
+        return f"{self.prefix}:v{self.version}:{ns}:v{self.namespaces[ns].version}:*"
+
+    # -- L2 ----------------------------------------------------------------
+
+    def _l2(self, op: str, *args, **kwargs):
+        if self.redis is None:
+            return None
+        try:
+            return getattr(self.redis, op)(*args, **kwargs)
+        except Exception as e:
+            logger.warning(f"⚠️ Redis {op} failed, using L1 only: {e}")
+            return None
+
+    # -- API ---------------------------------------------------------------
+
+    def get(self, ns: str, parts):
+        k = self.key(ns, parts)
+        value = self.l1.get(k)
+        if value is not None:
+            return value
+        raw = self._l2("get", k)
+        if raw is None:
+            return None
+        spec = self.namespaces[ns]
+        value = CODECS[spec.codec][1](raw)
+        ttl = self._l2("ttl", k)
+        self.l1.set(k, value, ttl if isinstance(ttl, int) and ttl > 0 else spec.ttl_s)
+        return value
+
+    def set(self, ns: str, parts, value, ttl_s: Optional[int] = None) -> None:
+        spec = self.namespaces[ns]
+        ttl = ttl_s or spec.ttl_s
+        k = self.key(ns, parts)
+        self.l1.set(k, value, ttl)
+        if self.redis is not None:
+            self._l2("set", k, CODECS[spec.codec][0](value), ex=int(ttl))
+
+    def exists(self, ns: str, parts) -> bool:
+        """Si la clave está en L1 o L2, sin traer ni decodificar el valor."""
+        k = self.key(ns, parts)
+        return self.l1.get(k) is not None or bool(self._l2("exists", k))
+
+    def delete(self, ns: str, parts) -> None:
+        k = self.key(ns, parts)
+        self.l1.delete(k)
+        self._l2("delete", k)
+
+    def get_or_set(self, ns: str, parts, compute: Callable[[], Any], ttl_s: Optional[int] = None,
+                   deadline: Optional[Deadline] = None):
+        """
+        ``get`` o, si falta, ``compute`` una sola vez para todos: dentro del
+        proceso los demás hilos esperan al primero (lock por clave, sin bloquear
+        otras claves) y entre workers se usa un lock ``SET NX`` en Redis que
+        dura lo que el deadline del que calcula. Toda espera se acota a
+        ``deadline.remaining()``; sin deadline, a ``CACHE_LOCK_TTL_S``.
+        """
+        value = self.get(ns, parts)
+        if value is not None:
+            return value
+        k = self.key(ns, parts)
+        while True:
+            with self._inflight_lock:
+                event = self._inflight.get(k)
+                leader = event is None
+                if leader:
+                    event = self._inflight[k] = threading.Event()
+            if leader:
+                break
+            if not event.wait(self._wait_budget(deadline)):
+                if deadline is not None:
+                    deadline.check()
+            value = self.get(ns, parts)
+            if value is not None:
+                return value
+            # El que calculaba falló (o tardó demasiado): se reintenta como líder
+        try:
+            return self._compute_shared(ns, parts, k, compute, ttl_s, deadline)
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(k, None)
+            event.set()
+
+    @staticmethod
+    def _wait_budget(deadline: Optional[Deadline]) -> float:
+        return deadline.remaining() if deadline is not None else settings.CACHE_LOCK_TTL_S
+
+    def _compute_shared(self, ns: str, parts, k: str, compute: Callable[[], Any],
+                        ttl_s: Optional[int], deadline: Optional[Deadline]):
+        lock_key, token = f"{k}:lock", uuid.uuid4().hex
+        while True:
+            value = self.get(ns, parts)
+            if value is not None:
+                return value
+            lock_ms = max(1000, int(self._wait_budget(deadline) * 1000))
+            got = self.redis is None or self._l2("set", lock_key, token, nx=True, px=lock_ms)
+            if got:
+                break
+            if self._l2("exists", lock_key) is None:
+                break  # Redis no responde: se calcula sin coordinación
+            # Otro worker está calculando: esperar su resultado o a que suelte el lock
+            value = self._wait_for(ns, parts, lock_key, deadline)
+            if value is not None:
+                return value
+            if deadline is not None:
+                deadline.check()
+        try:
+            value = compute()
+            self.set(ns, parts, value, ttl_s)
+            return value
+        finally:
+            if got and self.redis is not None and self._l2("get", lock_key) in (token, token.encode()):
+                self._l2("delete", lock_key)
+
+    def _wait_for(self, ns: str, parts, lock_key: str, deadline: Optional[Deadline]):
+        until = time.monotonic() + self._wait_budget(deadline)
+        delay = 0.02
+        while time.monotonic() < until:
+            time.sleep(min(delay, max(0.0, until - time.monotonic())))
+            delay = min(delay * 2, 0.5)
+            value = self.get(ns, parts)
+            if value is not None:
+                return value
+            if not self._l2("exists", lock_key):
+                return self.get(ns, parts)
+        return None
+
+    def iter_namespace(self, ns: str) -> Iterator[Tuple[str, Any]]:
+        """Recorre las entradas vivas de ``ns`` (L2 si existe; si no, L1)."""
+        decode = CODECS[self.namespaces[ns].codec][1]
+        if self.redis is not None:
+            for k in self._l2("scan_iter", match=self.ns_pattern(ns)) or []:
+                k = k.decode() if isinstance(k, bytes) else k
+                if k.endswith(":lock"):
+                    continue
+                raw = self._l2("get", k)
+                if raw is not None:
+                    yield k, decode(raw)
+            return
+        head = self.ns_pattern(ns)[:-1]
+        for k, v in self.l1.items():
+            if k.startswith(head):
+                yield k, v
+
+
+_cache: Optional[TwoTierCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> TwoTierCache:
+    """Caché del proceso; usa Redis si ``CACHE_URL`` está configurado."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            client = None
+            if settings.CACHE_URL:
+                if redis is None:
+                    logger.warning("⚠️ CACHE_URL set but redis package missing; using in-process cache only")
+                else:
+                    client = redis.Redis.from_url(settings.CACHE_URL, socket_timeout=1.0,
+                                                  socket_connect_timeout=1.0)
+            _cache = TwoTierCache(client)
+        return _cache
+
+
+def set_cache(cache: Optional[TwoTierCache]) -> None:
+    global _cache
+    with _cache_lock:
+        _cache = cache
@@ -12,7 +12,45 @@ class Settings(BaseSettings):
     GIOVANNI_SIGNIN_URL: str = "https://api.giovanni.earthdata.nasa.gov/signin"
     GIOVANNI_TS_URL: str = "https://api.giovanni.earthdata.nasa.gov/timeseries"
 
-    OFFLINE_MODE: bool = False  # por si quieres apagar llamadas externas en dev
+    OFFLINE_MODE: bool = False  # sin llamadas externas: todo sale del snapshot
+    SNAPSHOT_PATH: str | None = None    # snapshot por celdas (python -m app.nasa.snapshot export)
+    SNAPSHOT_CELL_DEG: float = 0.25     # rejilla de las celdas (la de GLDAS)
+
+    # Respuestas: comprimir (br/gzip) solo a partir de este tamaño
+    RESPONSE_COMPRESS_MIN_BYTES: int = 1024
+
+    # Resiliencia frente a caídas de Giovanni
+    CB_FAILURE_THRESHOLD: int = 3       # fallos seguidos que abren el circuito
+    CB_RESET_TIMEOUT_S: float = 60.0    # tiempo abierto antes de probar de nuevo
+    SERIES_FRESH_TTL_S: int = 14400     # 4 h: se sirve sin revalidar
+    SERIES_STALE_TTL_S: int = 7 * 86400 # hasta aquí se sirve vencida + refresh en 2º plano
+    CATALOG_TTL_S: int = 86400          # revalidación del catálogo de data ids
+    CATALOG_INVALID_POINTS: int = 3     # puntos distintos con fallo antes de descartar un data id
+
+    # Descarga por tramos calendario ("year" | "month"); por defecto una sola llamada
+    GIOVANNI_CHUNK: str | None = None
+    GIOVANNI_MAX_CONCURRENCY: int = 4
+    GIOVANNI_TILE_RETRIES: int = 2
+
+    # Caché de dos niveles: L1 en proceso + L2 Redis compartido (opcional)
+    CACHE_URL: str | None = None        # p. ej. redis://localhost:6379/0; vacío = solo L1
+    CACHE_TTL: int = 14400              # umbrales y muestras de ventana (ECDF)
+    RESPONSE_CACHE_TTL_S: int = 900     # respuestas ya serializadas
+    CACHE_VERSION: int = 1              # subirlo invalida todas las claves
+    CACHE_L1_MAX_MB: int = 64           # L1 por worker, acotado en memoria (no en entradas)
+    CACHE_LOCK_TTL_S: float = 240.0     # lock anti-estampida sin deadline (refrescos): > token + descarga
+
+    # Pool de procesos para cálculo pesado (None = CPUs / WEB_WORKERS, 0 = en línea)
+    WEB_WORKERS: int = 2                # workers de gunicorn (gunicorn_conf.py lee la misma variable)
+    COMPUTE_POOL_WORKERS: int | None = None
+    COMPUTE_POOL_MIN_ROWS: int = 5000   # por debajo no compensa el salto de proceso
+
+    # Deadlines por petición y control de admisión del trabajo upstream
+    REQUEST_DEADLINE_S: float = 100.0      # por debajo del timeout de gunicorn (120 s)
+    REQUEST_DEADLINE_MAX_S: float = 110.0  # tope para X-Request-Timeout del cliente
+    UPSTREAM_MAX_INFLIGHT: int = 4
+    UPSTREAM_MAX_QUEUE: int = 8
+    SHED_RETRY_AFTER_S: float = 5.0
 
     # Lee automáticamente api/.env (si ejecutas desde api/)
     model_config = SettingsConfigDict(
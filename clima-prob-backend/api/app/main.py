@@ -1,15 +1,25 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from .routes.probabilities import router as prob_router
 from fastapi.middleware.cors import CORSMiddleware
 from .config.settings import settings
+from .utils import compute_pool
 
-app = FastAPI(title="Weather Likelihood API", version="0.2.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Al parar el worker se cierran los procesos de cálculo que haya arrancado
+    compute_pool.shutdown()
+
+app = FastAPI(title="Weather Likelihood API", version="0.2.0", lifespan=lifespan)
 
 @app.get("/health")  
 def health():
     return {
         "ok": True, 
-        "mode": "live",
+        "mode": "offline" if settings.OFFLINE_MODE else "live",
+        "snapshot_configured": bool(settings.SNAPSHOT_PATH),
         "earthdata_configured": bool(settings.EARTHDATA_USERNAME and settings.EARTHDATA_PASSWORD)
     }
 
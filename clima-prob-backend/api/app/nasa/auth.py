@@ -2,13 +2,14 @@ import requests
 from requests.auth import HTTPBasicAuth
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
-import time
 import logging
 from ..config.settings import settings
+from .resilience import CircuitOpenError, get_breaker, host_key
+from ..utils.deadline import Deadline, DeadlineExceeded, exhausted, sleep_for, timeout_for
 
 logger = logging.getLogger(__name__)
 
-def giovanni_token() -> str:
+def giovanni_token(deadline: Deadline | None = None) -> str:
     user, pwd = settings.EARTHDATA_USERNAME, settings.EARTHDATA_PASSWORD
     if not (user and pwd):
         # Fallback opcional a ~/.netrc
@@ -27,8 +28,9 @@ def giovanni_token() -> str:
     session = requests.Session()
     
     # Estrategia de reintentos
+    # Con deadline los reintentos los hace el bucle de abajo (esperas acotadas)
     retry_strategy = Retry(
-        total=3,
+        total=0 if deadline is not None else 3,
         backoff_factor=2,  # 2, 4, 8 segundos
         status_forcelist=[429, 500, 502, 503, 504],
         allowed_methods=["GET"]
@@ -41,8 +43,16 @@ def giovanni_token() -> str:
     # Probar múltiples URLs automáticamente
     last_error = None
     token_received = False
+    skipped = []
     
     for url_idx, signin_url in enumerate(signin_urls):
+        # Circuito abierto para este host: ni siquiera intentarlo
+        breaker = get_breaker(host_key(signin_url))
+        if not breaker.allow():
+            logger.warning(f"🔌 Skipping {signin_url.split('/')[-1]} (circuit open)")
+            skipped.append(breaker)
+            continue
+
         logger.info(f"🎯 Trying URL {url_idx + 1}/{len(signin_urls)}: {signin_url.split('/')[-1]}")
         
         max_attempts = 2  # Menos intentos por URL
@@ -50,15 +60,17 @@ def giovanni_token() -> str:
             try:
                 logger.info(f"🔑 Attempting token (URL {url_idx + 1}, attempt {attempt + 1}/{max_attempts})")
                 
+                timeout = timeout_for(deadline, 90)  # Timeout más largo
                 r = session.get(
                     signin_url,
                     auth=HTTPBasicAuth(user, pwd),
                     allow_redirects=True,
-                    timeout=90,  # Timeout más largo
+                    timeout=timeout,
                 )
                 
                 # Verificar si la respuesta es un token válido (no HTML)
                 logger.info(f"✅ Connection success with URL: {signin_url.split('/')[-1]}")
+                breaker.record_success()
                 
                 # Verificar el contenido de la respuesta antes de aceptarla
                 ctype = r.headers.get("Content-Type", "").lower()
@@ -73,13 +85,26 @@ def giovanni_token() -> str:
                 token_received = True
                 break
                 
+            except DeadlineExceeded:
+                breaker.release()
+                raise
             except requests.exceptions.RequestException as e:
+                # Un timeout recortado por el deadline no es culpa del upstream
+                if isinstance(e, requests.exceptions.Timeout) and exhausted(deadline):
+                    breaker.release()
+                    raise DeadlineExceeded("Deadline agotado esperando el token EDL") from e
                 logger.warning(f"⚠️ {signin_url.split('/')[-1]} attempt {attempt + 1} failed: {str(e)}")
                 last_error = e
                 
                 if attempt < max_attempts - 1:
                     wait_time = 2
-                    time.sleep(wait_time)
+                    try:
+                        sleep_for(deadline, wait_time)
+                    except DeadlineExceeded:
+                        breaker.record_failure()
+                        raise
+                else:
+                    breaker.record_failure()
         else:
             # Si todos los intentos de esta URL fallaron, continuar con la siguiente
             continue
@@ -89,6 +114,8 @@ def giovanni_token() -> str:
             break
     else:
         # Si todas las URLs fallaron
+        if len(skipped) == len(signin_urls):
+            raise CircuitOpenError("giovanni-signin", min(b.retry_after() for b in skipped))
         raise RuntimeError(f"All Giovanni URLs failed. Last error: {str(last_error)}")
     
     # Si no obtuvimos token válido después de probar todas las URLs
@@ -1,25 +1,55 @@
+import hashlib
 import pandas as pd
 import logging
-from .gldas import gldas_daily_series
-from .imerg import imerg_daily_series
+from .resilience import CircuitOpenError
+from .snapshot import get_snapshot
+from .sources import SnapshotSource, get_source
+from ..cache.tiered import get_cache
 from ..config.settings import settings
+from ..utils.deadline import Deadline
 
 logger = logging.getLogger(__name__)
 
-def build_dataset(lat: float, lon: float, start_iso: str, end_iso: str) -> pd.DataFrame:
+def _digest(df: pd.DataFrame) -> bytes:
+    """Huella barata del contenido (índice, columnas y valores) para no releer el dataset cacheado."""
+    h = hashlib.sha1(repr(list(df.columns)).encode())
+    h.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return h.hexdigest().encode()
+
+def build_dataset(lat: float, lon: float, start_iso: str, end_iso: str,
+                  deadline: Deadline | None = None) -> pd.DataFrame:
     """
-    Construye dataset combinando GLDAS + IMERG - solo datos reales de NASA Giovanni
+    Construye el dataset diario desde la fuente configurada (``sources.py``):
+    NASA Giovanni (GLDAS + IMERG) o, con ``OFFLINE_MODE``, el snapshot local.
+    ``deadline`` es el presupuesto de la petición, propagado a cada llamada upstream.
     """
-    
-    logger.info("🌍 Fetching real NASA data from Giovanni...")
-    
-    # Solo usar Giovanni como fuente de datos
-    gldas = gldas_daily_series(lat, lon, start_iso, end_iso)
-    logger.info("✅ GLDAS data fetched successfully")
-    
-    imerg = imerg_daily_series(lat, lon, start_iso, end_iso)
-    logger.info("✅ IMERG data fetched successfully")
-    
-    df = gldas.join(imerg, how="outer").sort_index()
-    logger.info(f"📊 Final dataset shape: {df.shape}")
-    return df.loc[start_iso[:10]:end_iso[:10]]
+    source = get_source()
+    logger.info(f"🌍 Fetching daily dataset from source={source.name}...")
+    try:
+        out = source.daily(lat, lon, start_iso, end_iso, deadline)
+    except CircuitOpenError:
+        # Giovanni caído: si el snapshot cubre la celda, se sirve como dato vencido
+        snap = get_snapshot() if not settings.OFFLINE_MODE else None
+        if snap is None or not snap.covers(lat, lon):
+            raise
+        logger.warning("📦 Upstream circuit open; serving snapshot data")
+        out = SnapshotSource(snap).daily(lat, lon, start_iso, end_iso, deadline)
+        out.attrs["stale"] = True
+        return out
+
+    logger.info(f"📊 Final dataset shape: {out.shape}")
+    if out.attrs["stale"]:
+        logger.warning("⏳ Serving stale cached series (refresh running in background)")
+    elif source.name == "live" and not out.empty:
+        # Lo que queda en caché es lo que ``python -m app.nasa.snapshot export`` vuelca;
+        # solo se reescribe si falta o cambió (no en cada petición). Se compara
+        # una huella guardada al lado, sin traer ni decodificar el dataset
+        key = (round(lat, 4), round(lon, 4), start_iso, end_iso)
+        cache = get_cache()
+        digest = _digest(out)
+        if cache.get("dataset_digest", key) != digest or not cache.exists("dataset", key):
+            cached = out.copy(deep=False)
+            cached.attrs = {"lat": lat, "lon": lon}
+            cache.set("dataset", key, cached)
+            cache.set("dataset_digest", key, digest)
+    return out
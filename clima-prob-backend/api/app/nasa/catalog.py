@@ -0,0 +1,266 @@
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from ..config.settings import settings
+from .giovanni import giovanni_timeseries
+from .resilience import CircuitOpenError, any_stale, is_upstream_fault
+from ..utils.deadline import Deadline, DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+GLDAS_VARS = ("Tair_f_inst", "Wind_f_inst", "Qair_f_inst", "Psurf_f_inst")
+
+
+@dataclass
+class Product:
+    """Un data id de Giovanni y la cobertura temporal conocida (fechas inclusive)."""
+    data_id: str
+    begin: str
+    end: Optional[str] = None
+    valid: Optional[bool] = None          # None = aún no verificado
+    checked_at: float = 0.0
+    # Puntos (lat, lon) donde falló por causas propias → hora del fallo
+    failed_at: Dict[Tuple[float, float], float] = field(default_factory=dict, repr=False, compare=False)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def covers(self, day: pd.Timestamp) -> bool:
+        if day < pd.Timestamp(self.begin):
+            return False
+        return self.end is None or day <= pd.Timestamp(self.end)
+
+
+def _default_families() -> Dict[str, List[Product]]:
+    # Orden = preferencia. Coberturas nominales de GES DISC.
+    fams = {
+        "imerg_daily_precip": [
+            Product("GPM_3IMERGDF_07_precipitation", "1998-01-01"),
+            Product("GPM_3IMERGDF_07_precipitationCal", "1998-01-01"),
+            Product("GPM_3IMERGDF_precipitation", "2000-06-01"),
+            Product("GPM_3IMERGDF_precipitationCal", "2000-06-01"),
+        ],
+    }
+    for v in GLDAS_VARS:
+        fams[f"gldas_{v}"] = [
+            Product(f"GLDAS_NOAH025_3H_2_1_{v}", "2000-01-01"),
+            Product(f"GLDAS_NOAH025_3H_2_0_{v}", "1948-01-01", "2014-12-31"),
+        ]
+    return fams
+
+
+# Mensajes de Giovanni que culpan al data id (no al punto ni al rango pedidos)
+_ID_ERROR = re.compile(r"data[\s_-]*id|(unknown|invalid|unsupported)\s+(data|dataset|variable|parameter)", re.I)
+
+
+def _is_id_error(e: Exception) -> bool:
+    resp = getattr(e, "response", None)
+    text = f"{e} {getattr(resp, 'text', '') or ''}" if resp is not None else str(e)
+    return bool(_ID_ERROR.search(text))
+
+
+def _covers(plan: List[Tuple[str, str, str]], start_iso: str, end_iso: str) -> bool:
+    """¿El plan cubre todos los días de ``start_iso``..``end_iso`` sin huecos?"""
+    day = _day(start_iso)
+    for _, s_iso, e_iso in plan:
+        if _day(s_iso) > day:
+            return False
+        day = max(day, _day(e_iso) + pd.Timedelta(days=1))
+    return day > _day(end_iso)
+
+
+def _day(iso: str) -> pd.Timestamp:
+    return pd.Timestamp(iso[:10])
+
+
+class DatasetCatalog:
+    """
+    Sabe qué data ids funcionan y qué rango cubren, para ir directo al correcto
+    en vez de probar candidatos en serie. Un rango largo se parte por versión
+    de producto cuando cambia la cobertura. La validez se revisa en segundo
+    plano cada ``CATALOG_TTL_S``.
+    """
+
+    def __init__(self, families: Optional[Dict[str, List[Product]]] = None):
+        self.families = families if families is not None else _default_families()
+        self._lock = threading.Lock()
+        self._probing: set = set()
+        self._prober = ThreadPoolExecutor(max_workers=1, thread_name_prefix="catalog-probe")
+
+    # -- estado ------------------------------------------------------------
+
+    def product(self, data_id: str) -> Product:
+        for prods in self.families.values():
+            for p in prods:
+                if p.data_id == data_id:
+                    return p
+        raise KeyError(data_id)
+
+    def family_of(self, data_id: str) -> str:
+        for family, prods in self.families.items():
+            if any(p.data_id == data_id for p in prods):
+                return family
+        raise KeyError(data_id)
+
+    def mark(self, data_id: str, valid: bool) -> None:
+        p = self.product(data_id)
+        if not valid and not any(o.valid is not False for o in self.families[self.family_of(data_id)] if o is not p):
+            # Nunca se deja una familia sin candidatos: el siguiente fallo real lo dirá la petición
+            logger.warning(f"🗂️ Catalog: not invalidating {data_id}, last candidate of its family")
+            return
+        with p.lock:
+            if p.valid != valid:
+                logger.info(f"🗂️ Catalog: {data_id} {'valid' if valid else 'INVALID'}")
+            p.valid, p.checked_at = valid, time.time()
+            if valid:
+                p.failed_at.clear()
+
+    def observe(self, data_id: str) -> None:
+        """El producto devolvió datos: es válido. La cobertura se deja nominal
+        (un punto con huecos al principio no dice nada del resto)."""
+        self.mark(data_id, True)
+
+    def failure(self, data_id: str, lat: float, lon: float, e: Exception) -> None:
+        """
+        Fallo propio del producto (4xx, CSV inválido). Solo se marca inválido
+        con señales a nivel de data id: un mensaje que culpa al id, o el mismo
+        tipo de fallo en ``CATALOG_INVALID_POINTS`` puntos distintos.
+        """
+        if _is_id_error(e):
+            self.mark(data_id, False)
+            return
+        p = self.product(data_id)
+        now = time.time()
+        with p.lock:
+            p.failed_at[(round(lat, 2), round(lon, 2))] = now
+            for pt, t in list(p.failed_at.items()):
+                if now - t >= settings.CATALOG_TTL_S:
+                    del p.failed_at[pt]
+            n_points = len(p.failed_at)
+        if n_points >= settings.CATALOG_INVALID_POINTS:
+            self.mark(data_id, False)
+
+    # -- planificación -----------------------------------------------------
+
+    def plan(self, family: str, start_iso: str, end_iso: str,
+             exclude: Tuple[str, ...] = ()) -> List[Tuple[str, str, str]]:
+        """
+        Lista de ``(data_id, seg_start_iso, seg_end_iso)`` que cubre el rango,
+        eligiendo por tramo el primer producto válido (o sin verificar).
+        """
+        prods = [p for p in self.families[family] if p.valid is not False and p.data_id not in exclude]
+        start, end = _day(start_iso), _day(end_iso)
+        cuts = {start, end + pd.Timedelta(days=1)}
+        for p in prods:
+            cuts.add(pd.Timestamp(p.begin))
+            if p.end is not None:
+                cuts.add(pd.Timestamp(p.end) + pd.Timedelta(days=1))
+        cuts = sorted(c for c in cuts if start <= c <= end + pd.Timedelta(days=1))
+
+        segs: List[List] = []
+        for a, b in zip(cuts[:-1], cuts[1:]):
+            chosen = next((p.data_id for p in prods if p.covers(a)), None)
+            if chosen is None:
+                continue
+            last_day = b - pd.Timedelta(days=1)
+            if segs and segs[-1][0] == chosen and segs[-1][2] + pd.Timedelta(days=1) == a:
+                segs[-1][2] = last_day
+            else:
+                segs.append([chosen, a, last_day])
+
+        out = []
+        for data_id, a, b in segs:
+            s_iso = start_iso if a == start else f"{a.date().isoformat()}T00:00:00"
+            e_iso = end_iso if b == end else f"{b.date().isoformat()}T23:59:59"
+            out.append((data_id, s_iso, e_iso))
+        return out
+
+    # -- refresco periódico --------------------------------------------------
+
+    def _expired(self, family: str) -> List[Product]:
+        # Solo se revalida lo ya aprendido; lo no verificado se aprende con el tráfico
+        now = time.time()
+        return [p for p in self.families[family]
+                if p.checked_at and now - p.checked_at >= settings.CATALOG_TTL_S]
+
+    def _probe(self, family: str, lat: float, lon: float) -> None:
+        try:
+            for p in self._expired(family):
+                day = pd.Timestamp(p.begin) + pd.Timedelta(days=31)
+                s_iso, e_iso = f"{day.date()}T00:00:00", f"{day.date()}T23:59:59"
+                try:
+                    giovanni_timeseries(p.data_id, lat, lon, s_iso, e_iso, None)
+                    self.mark(p.data_id, True)
+                except Exception as e:
+                    if isinstance(e, CircuitOpenError) or is_upstream_fault(e):
+                        return  # caída del upstream: no concluir nada
+                    self.failure(p.data_id, lat, lon, e)
+        finally:
+            with self._lock:
+                self._probing.discard(family)
+
+    def maybe_refresh(self, family: str, lat: float, lon: float) -> None:
+        if not self._expired(family):
+            return
+        with self._lock:
+            if family in self._probing:
+                return
+            self._probing.add(family)
+        self._prober.submit(self._probe, family, lat, lon)
+
+    # -- descarga ------------------------------------------------------------
+
+    def fetch(self, family: str, lat: float, lon: float, start_iso: str, end_iso: str,
+              deadline: Deadline | None = None) -> pd.DataFrame:
+        """
+        Descarga ``family`` en el rango usando el plan del catálogo. Si un
+        producto falla por causas propias (4xx, CSV inválido) el tramo se
+        re-planifica con el siguiente candidato, siempre que cubra el tramo
+        entero; ver ``failure`` para cuándo se recuerda como inválido para
+        todos. Los fallos del upstream se propagan tal cual.
+        """
+        self.maybe_refresh(family, lat, lon)
+        parts, stale, tried, last_err = [], False, set(), None
+        pending = self.plan(family, start_iso, end_iso)
+        while pending:
+            data_id, s_iso, e_iso = pending.pop(0)
+            try:
+                p = self.product(data_id)
+                df = giovanni_timeseries(data_id, lat, lon, s_iso, e_iso, None, deadline=deadline,
+                                         coverage=(p.begin, p.end))
+            except Exception as e:
+                # Caída del upstream (5xx, timeout, circuito abierto): otro producto
+                # solo taparía el hueco con menos cobertura, así que se propaga
+                if isinstance(e, (DeadlineExceeded, CircuitOpenError)) or is_upstream_fault(e):
+                    raise
+                last_err = e
+                self.failure(data_id, lat, lon, e)
+                tried.add(data_id)
+                logger.warning(f"⚠️ {data_id} failed for {s_iso[:10]}..{e_iso[:10]}: {e}")
+                replan = self.plan(family, s_iso, e_iso, exclude=tuple(tried))
+                if not _covers(replan, s_iso, e_iso):
+                    raise RuntimeError(
+                        f"{family}: ningún otro producto cubre {s_iso[:10]}..{e_iso[:10]} tras fallar {data_id}: {e}"
+                    ) from e
+                pending = replan + pending
+                continue
+            self.observe(data_id)
+            stale = stale or any_stale((df,))
+            parts.append(df.iloc[:, :1].set_axis([family], axis=1))
+
+        if not parts:
+            if last_err is None:
+                raise RuntimeError(f"{family} no disponible: ningún producto cubre {start_iso[:10]}..{end_iso[:10]}")
+            raise RuntimeError(f"{family} no disponible. Último error: {repr(last_err)}")
+        out = pd.concat(parts).sort_index()
+        out = out[~out.index.duplicated(keep="first")]
+        out.attrs["stale"] = stale
+        return out
+
+
+catalog = DatasetCatalog()
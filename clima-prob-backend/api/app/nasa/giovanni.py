@@ -1,5 +1,13 @@
 import io, re, requests, pandas as pd
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from .auth import giovanni_token
+from .resilience import CircuitOpenError, any_stale, is_upstream_fault, serve_series, guarded_call, ensure_not_open, host_key, data_key, record_fault
+from ..config.settings import settings
+from ..utils.deadline import Deadline, DeadlineExceeded, exhausted, sleep_for, timeout_for
+
+logger = logging.getLogger(__name__)
 
 TS_URL = "https://api.giovanni.earthdata.nasa.gov/timeseries"
 
@@ -24,10 +32,137 @@ def parse_giovanni_csv(csv_text: str) -> pd.DataFrame:
     df[val_col] = pd.to_numeric(df[val_col], errors="coerce")
     return df[[val_col]]
 
-def giovanni_timeseries(data_id: str, lat: float, lon: float, start_iso: str, end_iso: str, token: str | None=None) -> pd.DataFrame:
-    token = token or giovanni_token()
+_ISO = "%Y-%m-%dT%H:%M:%S"
+
+def calendar_tiles(start_iso: str, end_iso: str, unit: str = "year") -> list[tuple[str, str]]:
+    """
+    Años o meses calendario completos que cubren ``start_iso``/``end_iso``.
+    Los tramos no dependen del rango exacto pedido, así que su caché se
+    reutiliza entre peticiones con fechas distintas.
+    """
+    start, end = pd.Timestamp(start_iso), pd.Timestamp(end_iso)
+    step = {"year": pd.offsets.YearBegin(1), "month": pd.offsets.MonthBegin(1)}[unit]
+    first = start.to_period({"year": "Y", "month": "M"}[unit]).start_time
+    return [
+        (a.strftime(_ISO), (a + step - pd.Timedelta(seconds=1)).strftime(_ISO))
+        for a in pd.date_range(first, end, freq={"year": "YS", "month": "MS"}[unit])
+    ]
+
+def _clip_tiles(tiles: list[tuple[str, str]], lo_iso: str, hi_iso: str) -> list[tuple[str, str]]:
+    # Cadenas ISO del mismo formato: el orden lexicográfico es el cronológico
+    out = [(max(a, lo_iso), min(b, hi_iso)) for a, b in tiles]
+    return [(a, b) for a, b in out if a <= b]
+
+def giovanni_timeseries(data_id: str, lat: float, lon: float, start_iso: str, end_iso: str, token: str | None=None,
+                        chunk: str | None = "auto", max_workers: int | None = None,
+                        deadline: Deadline | None = None,
+                        coverage: tuple[str, str | None] | None = None) -> pd.DataFrame:
+    """
+    Serie de Giovanni con breakers por host/data id y stale-while-revalidate:
+    si hay una copia previa se sirve de inmediato (``attrs["stale"]`` indica si
+    está vencida) y el token solo se pide cuando hay que ir a la red.
+
+    ``chunk`` ("year" | "month" | None; "auto" = ``settings.GIOVANNI_CHUNK``)
+    descarga rangos largos por tramos calendario completos en paralelo,
+    reintentando cada tramo por separado; cada tramo se cachea con su propia
+    clave y el resultado se recorta al rango pedido. Los tramos solo se
+    recortan a ``coverage`` (begin, end nominales del producto) y a hoy.
+
+    ``deadline`` acota timeouts, esperas y reintentos al tiempo que le queda a
+    la petición (el refresco en segundo plano no lo hereda).
+    """
+    chunk = settings.GIOVANNI_CHUNK if chunk == "auto" else chunk
+    if chunk:
+        begin, end = coverage or (None, None)
+        hi = min(f"{end}T23:59:59" if end else "9999", pd.Timestamp.now(tz="UTC").strftime("%Y-%m-%dT23:59:59"))
+        tiles = _clip_tiles(calendar_tiles(start_iso, end_iso, chunk), f"{begin}T00:00:00" if begin else "", hi)
+        tiles = tiles or [(start_iso, end_iso)]
+    else:
+        tiles = [(start_iso, end_iso)]
+    token_lock = threading.Lock()
+    token_box = [token]
+
+    def get_token(dl: Deadline | None) -> str:
+        with token_lock:
+            if not token_box[0]:
+                token_box[0] = giovanni_token(deadline=dl)
+            return token_box[0]
+
+    if tiles == [(start_iso, end_iso)]:
+        return _tile_timeseries(data_id, lat, lon, start_iso, end_iso, get_token, deadline)
+
+    # Los fallos de cada tramo no cuentan para el breaker: una ola de tramos
+    # con fallos sueltos lo abriría a mitad de los reintentos. Si se agotan,
+    # la llamada entera cuenta como un único fallo.
+    def tile(t: tuple[str, str]) -> pd.DataFrame:
+        return _tile_timeseries(data_id, lat, lon, t[0], t[1], get_token, deadline, count_faults=False)
+
+    workers = min(len(tiles), max_workers or settings.GIOVANNI_MAX_CONCURRENCY)
+    results: dict[tuple[str, str], pd.DataFrame] = {}
+    pending, last_err = list(tiles), None
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="giovanni-tile") as ex:
+        for attempt in range(settings.GIOVANNI_TILE_RETRIES + 1):
+            if attempt:
+                logger.warning(f"🔁 Retrying {len(pending)} failed tile(s) of {data_id} (attempt {attempt + 1})")
+                sleep_for(deadline, min(2 ** attempt, 8))
+            futures = {ex.submit(tile, t): t for t in pending}
+            pending = []
+            for fut, t in futures.items():
+                try:
+                    results[t] = fut.result()
+                except Exception as e:
+                    # Solo se reintentan fallos transitorios del upstream
+                    if isinstance(e, CircuitOpenError) or not is_upstream_fault(e):
+                        raise
+                    last_err = e
+                    pending.append(t)
+            if not pending:
+                break
+    if pending:
+        logger.warning(f"❌ {len(pending)}/{len(tiles)} tile(s) of {data_id} failed after retries: {last_err}")
+        record_fault(host_key(TS_URL), data_key(data_id))
+        raise last_err
+
+    parts = [results[t] for t in tiles]
+    df = pd.concat(parts).sort_index()
+    df = df[~df.index.duplicated(keep="first")]
+    lo, hi = pd.Timestamp(start_iso, tz="UTC"), pd.Timestamp(end_iso, tz="UTC")
+    idx = df.index if df.index.tz is not None else df.index.tz_localize("UTC")
+    df = df.loc[(idx >= lo) & (idx <= hi)]
+    df.attrs = {"stale": any_stale(parts)}
+    return df
+
+def _tile_timeseries(data_id: str, lat: float, lon: float, start_iso: str, end_iso: str, get_token,
+                     deadline: Deadline | None = None, count_faults: bool = True) -> pd.DataFrame:
+    key = (data_id, round(lat, 4), round(lon, 4), start_iso, end_iso)
+    host, data = host_key(TS_URL), data_key(data_id)
+
+    def fetch(dl: Deadline | None, count: bool) -> pd.DataFrame:
+        ensure_not_open(host, data)
+        if dl is not None:
+            dl.check()
+        tok = get_token(dl)
+        return guarded_call(
+            lambda: _fetch_timeseries(data_id, lat, lon, start_iso, end_iso, tok, deadline=dl),
+            host=host, data=data, count_faults=count,
+        )
+
+    # El refresco en segundo plano no tiene quien lo reintente: sus fallos sí cuentan
+    return serve_series(key, lambda: fetch(deadline, count_faults), refresh=lambda: fetch(None, True),
+                        deadline=deadline)
+
+def _fetch_timeseries(data_id: str, lat: float, lon: float, start_iso: str, end_iso: str, token: str | None=None,
+                      deadline: Deadline | None = None) -> pd.DataFrame:
+    token = token or giovanni_token(deadline=deadline)
     params = {"data": data_id, "location": f"[{lat},{lon}]", "time": f"{start_iso}/{end_iso}"}
-    r = requests.get(TS_URL, params=params, headers={"authorizationtoken": token}, timeout=120)
+    timeout = timeout_for(deadline, 120)
+    try:
+        r = requests.get(TS_URL, params=params, headers={"authorizationtoken": token}, timeout=timeout)
+    except requests.exceptions.Timeout as e:
+        # Un timeout recortado por el deadline no es culpa del upstream
+        if exhausted(deadline):
+            raise DeadlineExceeded(f"Deadline agotado esperando {data_id}") from e
+        raise
     r.raise_for_status()
 
     try:
@@ -1,18 +1,34 @@
 import pandas as pd
-from .giovanni import giovanni_timeseries
+from .catalog import catalog
 from .derived import K_to_C, daily_agg, rh_from_q_p_t, heat_index_C
+from .resilience import any_stale
+from ..utils.compute_pool import run_on_frame
+from ..utils.deadline import Deadline
 
-def gldas_daily_series(lat: float, lon: float, start_iso: str, end_iso: str) -> pd.DataFrame:
-    t_df = giovanni_timeseries("GLDAS_NOAH025_3H_2_1_Tair_f_inst",  lat, lon, start_iso, end_iso, None)
-    w_df = giovanni_timeseries("GLDAS_NOAH025_3H_2_1_Wind_f_inst",  lat, lon, start_iso, end_iso, None)
-    q_df = giovanni_timeseries("GLDAS_NOAH025_3H_2_1_Qair_f_inst",  lat, lon, start_iso, end_iso, None)
-    p_df = giovanni_timeseries("GLDAS_NOAH025_3H_2_1_Psurf_f_inst", lat, lon, start_iso, end_iso, None)
+def gldas_daily_series(lat: float, lon: float, start_iso: str, end_iso: str,
+                       deadline: Deadline | None = None) -> pd.DataFrame:
+    t_df = catalog.fetch("gldas_Tair_f_inst", lat, lon, start_iso, end_iso, deadline)
+    w_df = catalog.fetch("gldas_Wind_f_inst", lat, lon, start_iso, end_iso, deadline)
+    q_df = catalog.fetch("gldas_Qair_f_inst", lat, lon, start_iso, end_iso, deadline)
+    p_df = catalog.fetch("gldas_Psurf_f_inst", lat, lon, start_iso, end_iso, deadline)
 
-    T_K   = t_df[t_df.columns[0]]
+    hourly = pd.concat({
+        "T_K":   t_df[t_df.columns[0]],
+        "WS":    w_df[w_df.columns[0]],
+        "Qair":  q_df[q_df.columns[0]],
+        "Psurf": p_df[p_df.columns[0]],
+    }, axis=1)
+    out = run_on_frame(gldas_daily_from_3h, hourly)
+    out.attrs["stale"] = any_stale((t_df, w_df, q_df, p_df))
+    return out
+
+def gldas_daily_from_3h(hourly: pd.DataFrame) -> pd.DataFrame:
+    """Derivadas (RH, HI) y agregados diarios a partir de las series 3-horarias."""
+    T_K   = hourly["T_K"]
     T_C   = K_to_C(T_K)
-    WS    = w_df[w_df.columns[0]]
-    Qair  = q_df[q_df.columns[0]]
-    Psurf = p_df[p_df.columns[0]]
+    WS    = hourly["WS"]
+    Qair  = hourly["Qair"]
+    Psurf = hourly["Psurf"]
 
     RH_pct  = rh_from_q_p_t(Qair, Psurf, T_K)
     HI_C_hr = heat_index_C(T_C, RH_pct)
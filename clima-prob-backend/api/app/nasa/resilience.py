@@ -0,0 +1,257 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Tuple
+from urllib.parse import urlparse
+
+import pandas as pd
+import requests
+
+from ..cache.tiered import get_cache
+from ..config.settings import settings
+from ..utils.deadline import Deadline, DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(RuntimeError):
+    """Se lanza sin tocar la red cuando el circuito de un upstream está abierto."""
+
+    def __init__(self, key: str, retry_after: float):
+        super().__init__(f"Circuito abierto para {key}; reintentar en {retry_after:.0f}s")
+        self.key = key
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Breaker clásico closed → open → half-open:
+    - ``failure_threshold`` fallos seguidos abren el circuito;
+    - tras ``reset_timeout`` segundos deja pasar una sola llamada de prueba.
+    """
+
+    def __init__(self, key: str, failure_threshold: int, reset_timeout: float):
+        self.key = key
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def allow(self) -> bool:
+        with self._lock:
+            st = self.state
+            if st == "closed":
+                return True
+            if st == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def release(self) -> None:
+        """Devuelve un permiso de prueba que al final no se usó."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(f"🔌 Circuit opened for {self.key} after {self.failures} failures")
+                self.opened_at = time.monotonic()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(key: str) -> CircuitBreaker:
+    with _breakers_lock:
+        br = _breakers.get(key)
+        if br is None:
+            br = _breakers[key] = CircuitBreaker(
+                key, settings.CB_FAILURE_THRESHOLD, settings.CB_RESET_TIMEOUT_S
+            )
+        return br
+
+
+def host_key(url: str) -> str:
+    return f"host:{urlparse(url).netloc}"
+
+
+def data_key(data_id: str) -> str:
+    return f"data:{data_id}"
+
+
+def is_upstream_fault(exc: BaseException) -> bool:
+    """Timeouts, errores de conexión y 5xx cuentan contra el host; un 4xx no."""
+    if isinstance(exc, requests.exceptions.HTTPError) and exc.response is not None:
+        return exc.response.status_code >= 500 or exc.response.status_code == 429
+    return isinstance(exc, requests.exceptions.RequestException)
+
+
+def ensure_not_open(*keys: str) -> None:
+    """Chequeo barato previo (no consume el permiso de prueba del half-open)."""
+    for k in keys:
+        br = get_breaker(k)
+        if br.state == "open":
+            raise CircuitOpenError(k, br.retry_after())
+
+
+def guarded_call(fn: Callable, host: str, data: str | None = None, count_faults: bool = True):
+    """
+    Ejecuta ``fn`` respetando los breakers del host y (opcional) del data id.
+    Falla rápido con ``CircuitOpenError`` si alguno está abierto.
+    Con ``count_faults=False`` un fallo del upstream no se anota: lo anota el
+    llamador una sola vez (``record_fault``) cuando agota sus reintentos.
+    """
+    keys = [k for k in (host, data) if k]
+    allowed = []
+    for k in keys:
+        br = get_breaker(k)
+        if not br.allow():
+            for a in allowed:
+                a.release()
+            raise CircuitOpenError(k, br.retry_after())
+        allowed.append(br)
+    try:
+        out = fn()
+    except DeadlineExceeded:
+        # Presupuesto de la petición agotado/cancelado: no dice nada del upstream
+        for a in allowed:
+            a.release()
+        raise
+    except Exception as e:
+        if not count_faults and is_upstream_fault(e):
+            for a in allowed:
+                a.release()
+            raise
+        if data:
+            get_breaker(data).record_failure()
+        if is_upstream_fault(e):
+            get_breaker(host).record_failure()
+        else:
+            get_breaker(host).record_success()
+        raise
+    for k in keys:
+        get_breaker(k).record_success()
+    return out
+
+
+def record_fault(host: str, data: str | None = None) -> None:
+    """Un fallo del upstream, anotado a mano (ver ``count_faults`` en ``guarded_call``)."""
+    for k in (host, data):
+        if k:
+            get_breaker(k).record_failure()
+
+
+# ---------------------------------------------------------------------------
+# Stale-while-revalidate para series crudas
+# ---------------------------------------------------------------------------
+
+_refresh_lock = threading.Lock()
+_refreshing: set = set()
+_refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="swr-refresh")
+
+
+def _mark(df: pd.DataFrame, fetched_at: float, stale: bool) -> pd.DataFrame:
+    out = df.copy(deep=False)
+    out.attrs = {**df.attrs, "stale": stale, "fetched_at": fetched_at}
+    return out
+
+
+def _stamp(df: pd.DataFrame) -> pd.DataFrame:
+    """Copia con la hora de descarga, lista para la caché."""
+    out = df.copy(deep=False)
+    out.attrs = {k: v for k, v in df.attrs.items() if k != "stale"}
+    out.attrs["fetched_at"] = time.time()
+    return out
+
+
+def _store(key: Tuple, df: pd.DataFrame) -> pd.DataFrame:
+    """Guarda la serie en la caché compartida con la hora de descarga."""
+    out = _stamp(df)
+    get_cache().set("series", key, out)
+    return out
+
+
+def _refresh(key: Tuple, fetch: Callable[[], pd.DataFrame]) -> None:
+    try:
+        _store(key, fetch())
+        logger.info(f"🔄 Background refresh OK for {key[0]}")
+    except Exception as e:
+        logger.warning(f"⚠️ Background refresh failed for {key[0]}: {e}")
+    finally:
+        with _refresh_lock:
+            _refreshing.discard(key)
+
+
+def _schedule_refresh(key: Tuple, fetch: Callable[[], pd.DataFrame]) -> None:
+    with _refresh_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+    _refresher.submit(_refresh, key, fetch)
+
+
+def serve_series(key: Tuple, fetch: Callable[[], pd.DataFrame],
+                 refresh: Callable[[], pd.DataFrame] | None = None,
+                 deadline: Deadline | None = None) -> pd.DataFrame:
+    """
+    Devuelve la serie de ``key`` (``refresh`` es la variante de ``fetch`` para
+    segundo plano, sin el deadline de la petición):
+    - copia fresca en caché → se sirve tal cual;
+    - copia vencida (hasta ``SERIES_STALE_TTL_S``) → se sirve marcada
+      ``attrs["stale"]`` y se refresca en segundo plano;
+    - sin copia → se descarga (o falla rápido si el circuito está abierto).
+    La copia vive en la caché de dos niveles (``app/cache``), compartida entre workers.
+    """
+    cache = get_cache()
+    entry = cache.get("series", key)
+    if entry is None:
+        # Primera descarga: un solo worker va a Giovanni, el resto espera su resultado
+        # (get_or_set hace la única escritura)
+        df = cache.get_or_set("series", key, lambda: _stamp(fetch()), deadline=deadline)
+        return _mark(df, float(df.attrs.get("fetched_at", time.time())), stale=False)
+
+    fetched_at = float(entry.attrs.get("fetched_at", 0.0))
+    age = time.time() - fetched_at
+    if age < settings.SERIES_FRESH_TTL_S:
+        return _mark(entry, fetched_at, stale=False)
+    if age < settings.SERIES_STALE_TTL_S:
+        _schedule_refresh(key, refresh or fetch)
+        return _mark(entry, fetched_at, stale=True)
+
+    try:
+        df = _store(key, fetch())
+    except Exception:
+        # Última red de seguridad: cualquier copia vieja es mejor que un 5xx
+        return _mark(entry, fetched_at, stale=True)
+    return _mark(df, df.attrs["fetched_at"], stale=False)
+
+
+def any_stale(frames: Iterable) -> bool:
+    return any(bool(getattr(f, "attrs", {}).get("stale")) for f in frames)
@@ -0,0 +1,205 @@
+import argparse
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from ..cache.codecs import decode_frame, encode_frame
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Formato del archivo (un solo fichero, sin dependencias extra):
+#   MAGIC | uint64 LE tamaño de cabecera | cabecera JSON | bloques
+# La cabecera indexa cada celda → (offset, length) de su bloque; cada bloque
+# es el dataset diario de la celda como npz (app/cache/codecs.py) comprimido
+# con zlib. Al abrir se hace mmap y solo se descomprimen las celdas pedidas.
+MAGIC = b"CLIMAPROB-SNAP1\n"
+_DECODED_CELLS = 32
+
+Cell = Tuple[float, float]
+
+
+class SnapshotMiss(LookupError):
+    """La celda pedida no está en el snapshot."""
+
+
+def cell_of(lat: float, lon: float, cell_deg: Optional[float] = None) -> Cell:
+    """Centro de la celda de la rejilla (por defecto 0.25°, la de GLDAS) que contiene el punto."""
+    deg = cell_deg or settings.SNAPSHOT_CELL_DEG
+    return (round(math.floor(lat / deg) * deg + deg / 2, 4), round(math.floor(lon / deg) * deg + deg / 2, 4))
+
+
+def cell_id(cell: Cell) -> str:
+    return f"{cell[0]:.4f},{cell[1]:.4f}"
+
+
+def write_snapshot(path: str, frames: Dict[Cell, pd.DataFrame], cell_deg: Optional[float] = None) -> dict:
+    """Escribe un snapshot con un dataset diario por celda. Devuelve la cabecera."""
+    deg = cell_deg or settings.SNAPSHOT_CELL_DEG
+    cells, blocks, offset = {}, [], 0
+    for cell, df in sorted(frames.items()):
+        df = df.sort_index().copy(deep=False)
+        df.attrs = {}
+        block = zlib.compress(encode_frame(df), 6)
+        cells[cell_id(cell)] = {
+            "offset": offset, "length": len(block), "rows": len(df),
+            "start": df.index[0].strftime("%Y-%m-%d") if len(df) else None,
+            "end": df.index[-1].strftime("%Y-%m-%d") if len(df) else None,
+            "columns": [str(c) for c in df.columns],
+        }
+        blocks.append(block)
+        offset += len(block)
+    header = {
+        "version": 1,
+        "cell_deg": deg,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "cells": cells,
+    }
+    raw = json.dumps(header).encode()
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(raw)))
+        f.write(raw)
+        for block in blocks:
+            f.write(block)
+    os.replace(tmp, path)
+    return header
+
+
+class Snapshot:
+    """Snapshot abierto en solo lectura (mmap); las celdas se decodifican bajo demanda."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # fichero vacío
+            self._file.close()
+            raise ValueError(f"Snapshot vacío o corrupto: {path}")
+        if self._mm[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"No es un snapshot de ClimaProb: {path}")
+        pos = len(MAGIC)
+        (size,) = struct.unpack("<Q", self._mm[pos:pos + 8])
+        self.header = json.loads(self._mm[pos + 8:pos + 8 + size])
+        self._data_start = pos + 8 + size
+        self.cell_deg = float(self.header["cell_deg"])
+        self.cells: Dict[str, dict] = self.header["cells"]
+        self._decoded: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def cell(self, lat: float, lon: float) -> Cell:
+        return cell_of(lat, lon, self.cell_deg)
+
+    def covers(self, lat: float, lon: float) -> bool:
+        return cell_id(self.cell(lat, lon)) in self.cells
+
+    def frame(self, lat: float, lon: float) -> pd.DataFrame:
+        cid = cell_id(self.cell(lat, lon))
+        entry = self.cells.get(cid)
+        if entry is None:
+            raise SnapshotMiss(f"Celda {cid} no incluida en el snapshot {os.path.basename(self.path)}")
+        with self._lock:
+            df = self._decoded.get(cid)
+            if df is not None:
+                self._decoded.move_to_end(cid)
+                return df
+        a = self._data_start + entry["offset"]
+        df = decode_frame(zlib.decompress(self._mm[a:a + entry["length"]]))
+        with self._lock:
+            self._decoded[cid] = df
+            while len(self._decoded) > _DECODED_CELLS:
+                self._decoded.popitem(last=False)
+        return df
+
+    def close(self) -> None:
+        self._mm.close()
+        self._file.close()
+
+
+_snapshot: Optional[Snapshot] = None
+_snapshot_lock = threading.Lock()
+
+
+def get_snapshot() -> Optional[Snapshot]:
+    """Snapshot configurado en ``SNAPSHOT_PATH`` (se reabre si la ruta cambia)."""
+    global _snapshot
+    path = settings.SNAPSHOT_PATH
+    with _snapshot_lock:
+        if not path:
+            return None
+        if _snapshot is None or _snapshot.path != path:
+            if _snapshot is not None:
+                _snapshot.close()
+            _snapshot = Snapshot(path)
+            logger.info(f"📦 Snapshot loaded: {path} ({len(_snapshot.cells)} cells)")
+        return _snapshot
+
+
+def export_from_cache(path: str, cache=None) -> dict:
+    """
+    Vuelca al snapshot los datasets diarios que tiene la caché (namespace
+    ``dataset``). Varios periodos de una misma celda se fusionan. Sin datasets
+    que volcar lanza ``RuntimeError`` en vez de escribir un snapshot vacío.
+    """
+    from ..cache.tiered import get_cache
+
+    cache = cache or get_cache()
+    frames: Dict[Cell, pd.DataFrame] = {}
+    for _, df in cache.iter_namespace("dataset"):
+        if "lat" not in df.attrs or "lon" not in df.attrs:
+            continue
+        cell = cell_of(df.attrs["lat"], df.attrs["lon"])
+        frames[cell] = df if cell not in frames else frames[cell].combine_first(df)
+    if not frames:
+        if cache.redis is None:
+            raise RuntimeError("No hay caché compartida (CACHE_URL vacío): la caché en proceso "
+                               "de este comando está vacía, no hay nada que exportar")
+        raise RuntimeError("La caché no tiene datasets diarios que exportar")
+    header = write_snapshot(path, frames)
+    logger.info(f"📦 Snapshot written: {path} ({len(header['cells'])} cells)")
+    return header
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.nasa.snapshot",
+                                     description="Snapshots offline de datasets diarios por celda")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    exp = sub.add_parser("export", help="volcar la caché (CACHE_URL) a un snapshot")
+    exp.add_argument("path")
+    info = sub.add_parser("info", help="listar las celdas de un snapshot")
+    info.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "export":
+        try:
+            header = export_from_cache(args.path)
+        except RuntimeError as e:
+            sys.exit(f"error: {e}")
+        print(f"{len(header['cells'])} cells → {args.path}")
+    else:
+        snap = Snapshot(args.path)
+        try:
+            print(f"{args.path}: {len(snap.cells)} cells, {snap.cell_deg}°, created {snap.header['created_at']}")
+            for cid, e in sorted(snap.cells.items()):
+                print(f"  {cid}  {e['start']}..{e['end']}  rows={e['rows']}  {e['length']} bytes")
+        finally:
+            snap.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
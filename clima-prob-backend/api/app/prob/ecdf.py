@@ -0,0 +1,63 @@
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from ..cache.tiered import get_cache
+from ..utils.timewin import ensure_daily_index, window_mask, wilson_intervals
+
+# variable → (evento, sentido de la excedencia); igual que empirical.py
+EVENTS = {
+    "Tmax_C": ("very_hot", ">="),
+    "Tmin_C": ("very_cold", "<="),
+    "WS_ms": ("very_windy", ">="),
+    "P_mmday": ("very_wet", ">="),
+    "HI_C": ("very_uncomfortable", ">="),
+}
+
+def window_ecdfs(
+    df_daily: pd.DataFrame,
+    date_of_interest: str | pd.Timestamp,
+    window_days: int,
+    variables: Optional[Iterable[str]] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Muestra de la ventana ±K días por variable, ordenada y sin NaN. Es todo lo
+    que hace falta para responder P(X >= u) / P(X <= u) para cualquier umbral.
+    """
+    df = ensure_daily_index(df_daily)
+    mask = window_mask(df.index, pd.to_datetime(date_of_interest), window_days)
+    sub = df.loc[mask]
+    variables = [v for v in (variables or EVENTS) if v in sub.columns]
+    return {v: np.sort(sub[v].dropna().to_numpy(dtype=float)) for v in variables}
+
+def exceedance(sorted_vals: np.ndarray, thresholds: Iterable[float], side: str = ">=", z: float = 1.96) -> Dict[str, list]:
+    """
+    Probabilidad de excedencia + intervalo de Wilson para muchos umbrales a la
+    vez, por búsqueda binaria sobre la muestra ordenada (O(log n) por umbral).
+    """
+    u = np.asarray(list(thresholds), dtype=float)
+    n = int(sorted_vals.size)
+    if side == ">=":
+        k = n - np.searchsorted(sorted_vals, u, side="left")
+    else:
+        k = np.searchsorted(sorted_vals, u, side="right")
+    p, lo, hi = wilson_intervals(k, n, z=z)
+    return {
+        "n": n,
+        "threshold": u.tolist(),
+        "k": k.astype(int).tolist(),
+        "prob": p.tolist(),
+        "lo": lo.tolist(),
+        "hi": hi.tolist(),
+    }
+
+
+def ecdf_key(lat: float, lon: float, start_iso: str, end_iso: str, date_of_interest: str, window_days: int) -> tuple:
+    return (round(lat, 4), round(lon, 4), start_iso, end_iso, str(date_of_interest), int(window_days))
+
+def get_cached(key: tuple) -> Optional[Dict[str, np.ndarray]]:
+    return get_cache().get("ecdf", key)
+
+def put_cached(key: tuple, ecdfs: Dict[str, np.ndarray]) -> None:
+    get_cache().set("ecdf", key, ecdfs)
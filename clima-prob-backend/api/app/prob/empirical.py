@@ -5,12 +5,15 @@ from .thresholds import Thresholds
 from ..utils.timewin import ensure_daily_index, window_mask, wilson_interval
 
 def _labels_from_thresholds(df: pd.DataFrame, thr: Thresholds) -> Dict[str, pd.Series]:
+    # Un día sin dato de la variable no cuenta como "sin evento": queda NaN y
+    # se excluye de n (misma muestra que el ECDF de app/prob/ecdf.py)
     lab = {}
-    if "Tmax_C" in df: lab["very_hot"]  = (df["Tmax_C"] >= thr.very_hot_Tmax_C)
-    if "Tmin_C" in df: lab["very_cold"] = (df["Tmin_C"] <= thr.very_cold_Tmin_C)
-    if "WS_ms"  in df: lab["very_windy"] = (df["WS_ms"] >= thr.very_windy_speed_ms)
-    if "P_mmday" in df: lab["very_wet"] = (df["P_mmday"] >= thr.very_wet_precip_mmday)
-    if "HI_C" in df: lab["very_uncomfortable"] = (df["HI_C"] >= thr.very_uncomfortable_HI_C)
+    def ev(col, cond): return cond.astype(float).where(df[col].notna())
+    if "Tmax_C" in df: lab["very_hot"]  = ev("Tmax_C", df["Tmax_C"] >= thr.very_hot_Tmax_C)
+    if "Tmin_C" in df: lab["very_cold"] = ev("Tmin_C", df["Tmin_C"] <= thr.very_cold_Tmin_C)
+    if "WS_ms"  in df: lab["very_windy"] = ev("WS_ms", df["WS_ms"] >= thr.very_windy_speed_ms)
+    if "P_mmday" in df: lab["very_wet"] = ev("P_mmday", df["P_mmday"] >= thr.very_wet_precip_mmday)
+    if "HI_C" in df: lab["very_uncomfortable"] = ev("HI_C", df["HI_C"] >= thr.very_uncomfortable_HI_C)
     return lab
 
 def empirical_probabilities(df_daily: pd.DataFrame, date_of_interest: str, thresholds: Thresholds, window_days: int = 7) -> Dict[str, Dict[str, float]]:
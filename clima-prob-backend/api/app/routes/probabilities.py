@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel, Field
 from datetime import date, timedelta
 from typing import Optional, Dict, List
@@ -7,9 +7,17 @@ import traceback
 import logging
 
 from ..nasa.build import build_dataset
+from ..nasa.resilience import CircuitOpenError
+from ..nasa.snapshot import SnapshotMiss
 from ..prob.thresholds import make_thresholds_from_df
 from ..prob.compute import compute_probabilities
 from ..prob.analytics import monthly_climatology, window_percentiles
+from ..prob import ecdf
+from ..cache.tiered import get_cache
+from ..utils.serialize import encode, negotiate, render, respond, series_payload
+from ..utils.compute_pool import FrameJobs
+from ..utils.deadline import Admission, Deadline, DeadlineExceeded, Overloaded, RequestCancelled, run_cancellable
+from ..config.settings import settings
 
 
 logging.basicConfig(level=logging.INFO)
@@ -33,11 +41,84 @@ class ProbabilitiesRequest(BaseModel):
     engine: str = Field("empirical", pattern="^(logistic|empirical)$")
     window_days: int = Field(7, ge=0, le=30)
     thresholds: ThresholdsIn | None = None
+    layout: str = Field("records", pattern="^(records|columnar)$")
+    include_ecdf: bool = False
+
+class ExceedanceRequest(BaseModel):
+    lat: float = Field(..., ge=-90, le=90)
+    lon: float = Field(..., ge=-180, le=180)
+    start_date: date
+    end_date: date
+    date_of_interest: date
+    window_days: int = Field(7, ge=0, le=30)
+    # variable → lista de umbrales, p.ej. {"Tmax_C": [28, 30, 32]}
+    thresholds: Dict[str, List[float]]
+
+# Trabajo upstream simultáneo por proceso; el resto se rechaza con 503
+_admission = Admission(settings.UPSTREAM_MAX_INFLIGHT, settings.UPSTREAM_MAX_QUEUE, settings.SHED_RETRY_AFTER_S)
+
+def _deadline_from(request: Request) -> Deadline:
+    """Presupuesto de la petición: header ``X-Request-Timeout`` (s) o el default."""
+    budget = settings.REQUEST_DEADLINE_S
+    raw = request.headers.get("x-request-timeout")
+    if raw:
+        try:
+            budget = float(raw)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="X-Request-Timeout must be a number of seconds")
+    return Deadline(min(max(budget, 1.0), settings.REQUEST_DEADLINE_MAX_S))
+
+def _fetch_dataset(lat: float, lon: float, start_iso: str, end_iso: str, deadline: Deadline) -> pd.DataFrame:
+    """``build_dataset`` bajo control de admisión, con los fallos upstream mapeados a HTTP."""
+    try:
+        with _admission.slot(deadline):
+            return build_dataset(lat, lon, start_iso, end_iso, deadline=deadline)
+    except Overloaded as e:
+        logger.warning(f"🚦 Shedding load: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e),
+                            headers={"Retry-After": str(max(1, int(e.retry_after)))})
+    except CircuitOpenError as e:
+        logger.warning(f"🔌 Failing fast, upstream circuit open: {str(e)}")
+        raise HTTPException(
+            status_code=503, detail=f"NASA Giovanni unavailable: {str(e)}",
+            headers={"Retry-After": str(max(1, int(e.retry_after)))},
+        )
+    except SnapshotMiss as e:
+        logger.warning(f"📦 {str(e)}")
+        raise HTTPException(status_code=422, detail=f"No data available offline for lat={lat}, lon={lon}: {str(e)}")
+    except RequestCancelled:
+        logger.warning("🔌 Client went away; upstream work abandoned")
+        raise HTTPException(status_code=499, detail="Client closed request")
+    except DeadlineExceeded as e:
+        logger.warning(f"⏱️ Deadline exceeded: {str(e)}")
+        raise HTTPException(status_code=504, detail=f"NASA data extraction timed out: {str(e)}")
+
+def _window_ecdfs(df: pd.DataFrame, lat: float, lon: float, start_iso: str, end_iso: str,
+                  date_of_interest: date, window_days: int) -> Dict:
+    key = ecdf.ecdf_key(lat, lon, start_iso, end_iso, date_of_interest.isoformat(), window_days)
+    out = ecdf.get_cached(key)
+    if out is None:
+        out = ecdf.window_ecdfs(df, date_of_interest.isoformat(), window_days)
+        if not df.attrs.get("stale", False):
+            ecdf.put_cached(key, out)
+    return out
 
 @router.post("/probabilities")
-def probabilities(req: ProbabilitiesRequest):
+async def probabilities(req: ProbabilitiesRequest, request: Request):
+    deadline = _deadline_from(request)
+    return await run_cancellable(request, deadline, _probabilities, req, request, deadline)
+
+def _probabilities(req: ProbabilitiesRequest, request: Request, deadline: Deadline):
     try:
         logger.info(f"🚀 Starting probability request for lat={req.lat}, lon={req.lon}, date={req.date_of_interest}")
+
+        # Misma petición + mismo formato → cuerpo ya serializado desde la caché
+        media_type = negotiate(request.headers.get("accept"))
+        r_key = ("probabilities", req.model_dump_json(), media_type)
+        body = get_cache().get("response", r_key)
+        if body is not None:
+            logger.info("⚡ Response cache hit")
+            return respond(request, body, media_type)
         
         start_iso = f"{req.start_date.isoformat()}T00:00:00"
         end_iso   = f"{req.end_date.isoformat()}T23:59:59"
@@ -45,78 +126,100 @@ def probabilities(req: ProbabilitiesRequest):
         logger.info(f"📅 Time range: {start_iso} to {end_iso}")
         try:
             logger.info("🌍 Fetching NASA data...")
-            df = build_dataset(req.lat, req.lon, start_iso, end_iso)
+            df = _fetch_dataset(req.lat, req.lon, start_iso, end_iso, deadline)
             logger.info(f"📊 Data shape: {df.shape}, columns: {list(df.columns)}")
             
             if df.empty:
                 logger.error("❌ DataFrame is empty!")
                 raise HTTPException(status_code=422, detail=f"No data available for lat={req.lat}, lon={req.lon} in period {req.start_date} to {req.end_date}")
                 
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"❌ NASA data extraction failed: {str(e)}")
             logger.error(f"Full traceback: {traceback.format_exc()}")
             raise HTTPException(status_code=500, detail=f"NASA data extraction failed: {str(e)}")
 
-        try:
-            logger.info("📈 Calculating thresholds...")
-            if req.thresholds is None or all(getattr(req.thresholds, k) is None for k in req.thresholds.model_fields):
-                thr = make_thresholds_from_df(df, req.date_of_interest.isoformat(), window_days=req.window_days)
-            else:
-                base = make_thresholds_from_df(df, req.date_of_interest.isoformat(), window_days=req.window_days)
-                user = {k: getattr(req.thresholds, k) for k in base.keys()}
-                thr = {k: (user[k] if user[k] is not None else base[k]) for k in base.keys()}
-            logger.info(f"✅ Thresholds calculated: {thr}")
-        except Exception as e:
-            logger.error(f"❌ Threshold calculation failed: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Threshold calculation failed: {str(e)}")
+        # Los cálculos sobre el dataset diario se reparten en el pool de
+        # procesos compartiendo el frame (una sola copia en memoria compartida).
+        doi_iso = req.date_of_interest.isoformat()
+        vars_for_clim = [v for v in ["Tmax_C","Tmin_C","WS_ms","P_mmday","HI_C"] if v in df.columns]
+        e_key = ecdf.ecdf_key(req.lat, req.lon, start_iso, end_iso, doi_iso, req.window_days)
+        # Lo derivado de datos vencidos no se cachea: no debe llegar a peticiones frescas
+        stale = bool(df.attrs.get("stale", False))
+        base = get_cache().get("thresholds", e_key)
+        with FrameJobs(df) as jobs:
+            thr_f = jobs.submit(make_thresholds_from_df, doi_iso, window_days=req.window_days) if base is None else None
+            clim_f = jobs.submit(monthly_climatology, variables=vars_for_clim, qextras=None)
+            ecdfs = ecdf.get_cached(e_key)
+            ecdf_f = jobs.submit(ecdf.window_ecdfs, doi_iso, req.window_days) if ecdfs is None else None
 
+            try:
+                if thr_f is not None:
+                    logger.info("📈 Calculating thresholds...")
+                    base = thr_f.result()
+                    if not stale:
+                        get_cache().set("thresholds", e_key, base)
+                if req.thresholds is None or all(getattr(req.thresholds, k) is None for k in req.thresholds.model_fields):
+                    thr = base
+                else:
+                    user = {k: getattr(req.thresholds, k) for k in base.keys()}
+                    thr = {k: (user[k] if user[k] is not None else base[k]) for k in base.keys()}
+                logger.info(f"✅ Thresholds calculated: {thr}")
+            except Exception as e:
+                logger.error(f"❌ Threshold calculation failed: {str(e)}")
+                raise HTTPException(status_code=500, detail=f"Threshold calculation failed: {str(e)}")
 
-        try:
             logger.info(f"🎯 Computing probabilities with engine={req.engine}...")
-            probs = compute_probabilities(
-                df, req.date_of_interest.isoformat(), thr,
-                window_days=req.window_days, engine=req.engine
-            )
-            logger.info(f"✅ Probabilities computed: {probs}")
-        except Exception as e:
-            logger.error(f"❌ Probability computation failed: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Probability computation failed: {str(e)}")
+            probs_f = jobs.submit(compute_probabilities, doi_iso, thr,
+                                  window_days=req.window_days, engine=req.engine)
+            win_f = jobs.submit(window_percentiles, date_of_interest=doi_iso, window_days=req.window_days,
+                                thresholds=thr, variables=vars_for_clim)
 
-        try:
-            logger.info("📊 Generating plot series...")
-            end_d = req.date_of_interest
-            start_d = end_d - timedelta(days=29)
-            last30 = df.loc[start_d.isoformat():end_d.isoformat()]
-            series_T = (
-                [{"date": d.date().isoformat(), "value": float(v)} for d, v in last30["Tmax_C"].dropna().items()]
-                if "Tmax_C" in df.columns else []
-            )
-            series_P = (
-                [{"date": d.date().isoformat(), "value": float(v)} for d, v in last30["P_mmday"].dropna().items()]
-                if "P_mmday" in df.columns else []
-            )
-        except Exception as e:
-            logger.warning(f"⚠️ Plot series generation failed (non-critical): {str(e)}")
-            series_T, series_P = [], []
+            try:
+                probs = probs_f.result()
+                logger.info(f"✅ Probabilities computed: {probs}")
+            except Exception as e:
+                logger.error(f"❌ Probability computation failed: {str(e)}")
+                raise HTTPException(status_code=500, detail=f"Probability computation failed: {str(e)}")
 
-        try:
-            logger.info("📈 Generating charts data...")
-            vars_for_clim = [v for v in ["Tmax_C","Tmin_C","WS_ms","P_mmday","HI_C"] if v in df.columns]
-            clim = monthly_climatology(df, variables=vars_for_clim, qextras=None)
-            win_stats = window_percentiles(
-                df_daily=df,
-                date_of_interest=req.date_of_interest.isoformat(),
-                window_days=req.window_days,
-                thresholds=thr,
-                variables=vars_for_clim
-            )
-            logger.info("✅ Charts data generated successfully")
-        except Exception as e:
-            logger.warning(f"⚠️ Charts generation failed (non-critical): {str(e)}")
-            clim, win_stats = {}, {}
+            try:
+                logger.info("📊 Generating plot series...")
+                end_d = req.date_of_interest
+                start_d = end_d - timedelta(days=29)
+                last30 = df.loc[start_d.isoformat():end_d.isoformat()]
+                plot_raw = {
+                    name: last30[col]
+                    for name, col in (("daily_Tmax_C_last30", "Tmax_C"), ("daily_P_mmday_last30", "P_mmday"))
+                    if col in df.columns
+                }
+                series_T = series_payload(plot_raw["daily_Tmax_C_last30"], req.layout) if "daily_Tmax_C_last30" in plot_raw else []
+                series_P = series_payload(plot_raw["daily_P_mmday_last30"], req.layout) if "daily_P_mmday_last30" in plot_raw else []
+            except Exception as e:
+                logger.warning(f"⚠️ Plot series generation failed (non-critical): {str(e)}")
+                plot_raw, series_T, series_P = {}, [], []
 
+            try:
+                logger.info("📈 Generating charts data...")
+                clim = clim_f.result()
+                win_stats = win_f.result()
+                logger.info("✅ Charts data generated successfully")
+            except Exception as e:
+                logger.warning(f"⚠️ Charts generation failed (non-critical): {str(e)}")
+                clim, win_stats = {}, {}
 
-        return {
+            try:
+                # Se cachea (si no es vencido): los barridos de umbral posteriores no reconstruyen el dataset
+                if ecdf_f is not None:
+                    ecdfs = ecdf_f.result()
+                    if not stale:
+                        ecdf.put_cached(e_key, ecdfs)
+            except Exception as e:
+                logger.warning(f"⚠️ Window ECDF failed (non-critical): {str(e)}")
+                ecdfs = {}
+
+
+        payload = {
             "location": {
                 "lat": req.lat, "lon": req.lon,
                 "period": f"{req.start_date}..{req.end_date}",
@@ -134,6 +237,9 @@ def probabilities(req: ProbabilitiesRequest):
             "meta": {
                 "engine": req.engine,
                 "window_days": req.window_days,
+                "layout": req.layout,
+                "stale": stale,
+                "source": df.attrs.get("source", "live"),
                 "units": {
                     "Tmax_C":"°C",
                     "Tmin_C":"°C",
@@ -145,6 +251,13 @@ def probabilities(req: ProbabilitiesRequest):
                 "thresholds": thr
             }
         }
+        if req.include_ecdf:
+            payload["ecdf"] = {v: x.tolist() for v, x in ecdfs.items()}
+        body = encode(payload, media_type, tables=plot_raw)
+        if not payload["meta"]["stale"]:
+            # Las respuestas con datos vencidos no se cachean: el refresh llegará pronto
+            get_cache().set("response", r_key, body)
+        return respond(request, body, media_type)
     
     except HTTPException:
         raise
@@ -152,3 +265,53 @@ def probabilities(req: ProbabilitiesRequest):
         error_detail = f"Unexpected error: {str(e)}"
         logger.error(f"Full traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=error_detail)
+
+
+@router.post("/probabilities/exceedance")
+async def exceedance(req: ExceedanceRequest, request: Request):
+    """
+    P(excedencia) + intervalo de Wilson para muchos umbrales por variable,
+    sobre la muestra de ventana cacheada (búsqueda binaria, sin recalcular).
+    """
+    deadline = _deadline_from(request)
+    return await run_cancellable(request, deadline, _exceedance, req, request, deadline)
+
+def _exceedance(req: ExceedanceRequest, request: Request, deadline: Deadline):
+    unknown = [v for v in req.thresholds if v not in ecdf.EVENTS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown variables: {unknown}. Allowed: {sorted(ecdf.EVENTS)}")
+
+    start_iso = f"{req.start_date.isoformat()}T00:00:00"
+    end_iso   = f"{req.end_date.isoformat()}T23:59:59"
+    key = ecdf.ecdf_key(req.lat, req.lon, start_iso, end_iso, req.date_of_interest.isoformat(), req.window_days)
+    ecdfs = ecdf.get_cached(key)
+    stale = False  # en caché solo hay muestras de datos frescos
+    if ecdfs is None:
+        logger.info("🌍 ECDF cache miss, fetching NASA data...")
+        try:
+            df = _fetch_dataset(req.lat, req.lon, start_iso, end_iso, deadline)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"❌ NASA data extraction failed: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"NASA data extraction failed: {str(e)}")
+        ecdfs = _window_ecdfs(df, req.lat, req.lon, start_iso, end_iso, req.date_of_interest, req.window_days)
+        stale = bool(df.attrs.get("stale", False))
+
+    out = {}
+    for var, thresholds in req.thresholds.items():
+        event, side = ecdf.EVENTS[var]
+        sample = ecdfs.get(var)
+        if sample is None:
+            continue
+        out[var] = {"event": event, "side": side, **ecdf.exceedance(sample, thresholds, side)}
+
+    return render(request, {
+        "location": {
+            "lat": req.lat, "lon": req.lon,
+            "period": f"{req.start_date}..{req.end_date}",
+            "date_of_interest": req.date_of_interest.isoformat()
+        },
+        "exceedance": out,
+        "meta": {"window_days": req.window_days, "stale": stale},
+    })
@@ -0,0 +1,214 @@
+import logging
+import multiprocessing as mp
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SharedFrame:
+    """
+    Descriptor (picklable) de un DataFrame numérico copiado una sola vez a
+    memoria compartida: índice datetime64[ns] (int64) + bloque float64
+    columna-mayor. El worker lo reconstruye sin copiar.
+    """
+    shm_name: str
+    n_rows: int
+    columns: Tuple[str, ...]
+    tz: Optional[str]
+    index_name: Optional[str]
+
+    @staticmethod
+    def create(df: pd.DataFrame) -> Tuple["SharedFrame", shared_memory.SharedMemory]:
+        n, m = df.shape
+        nbytes = max(8, 8 * n * (m + 1))
+        shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        idx = pd.DatetimeIndex(df.index)
+        buf = np.ndarray((m + 1, n), dtype=np.int64, buffer=shm.buf)
+        buf[0] = idx.asi8
+        vals = np.ndarray((m, n), dtype=np.float64, buffer=shm.buf, offset=8 * n)
+        vals[:] = df.to_numpy(dtype=np.float64).T
+        del buf, vals
+        desc = SharedFrame(shm.name, n, tuple(map(str, df.columns)),
+                           str(idx.tz) if idx.tz is not None else None, idx.name)
+        return desc, shm
+
+    def attach(self) -> Tuple[pd.DataFrame, shared_memory.SharedMemory]:
+        shm = shared_memory.SharedMemory(name=self.shm_name)
+        n, m = self.n_rows, len(self.columns)
+        ns = np.ndarray((n,), dtype=np.int64, buffer=shm.buf)
+        idx = pd.DatetimeIndex(ns.view("datetime64[ns]"), name=self.index_name)
+        if self.tz:
+            idx = idx.tz_localize("UTC").tz_convert(self.tz)
+        vals = np.ndarray((m, n), dtype=np.float64, buffer=shm.buf, offset=8 * n)
+        df = pd.DataFrame(vals.T, index=idx, columns=list(self.columns), copy=False)
+        return df, shm
+
+
+def _run_shared(desc: SharedFrame, func: Callable, args: tuple, kwargs: dict):
+    # Se ejecuta en el proceso worker
+    df, shm = desc.attach()
+    try:
+        return func(df, *args, **kwargs)
+    finally:
+        del df
+        try:
+            shm.close()
+        except BufferError:  # el resultado aún referencia el buffer; lo libera el GC
+            pass
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def pool_size() -> int:
+    """Procesos por worker web: por defecto las CPUs repartidas entre los ``WEB_WORKERS``."""
+    n = settings.COMPUTE_POOL_WORKERS
+    if n is None:
+        return max(1, (os.cpu_count() or 1) // max(1, settings.WEB_WORKERS))
+    return max(0, n)
+
+
+def get_pool() -> Optional[ProcessPoolExecutor]:
+    """Pool de procesos perezoso (``spawn``: seguro con hilos en el proceso padre)."""
+    global _pool
+    if pool_size() == 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=pool_size(), mp_context=mp.get_context("spawn"))
+            logger.info(f"🧮 Compute pool started with {pool_size()} workers")
+        return _pool
+
+
+def _reset_pool(broken: Optional[ProcessPoolExecutor] = None) -> None:
+    """Descarta el pool (solo si sigue siendo ``broken``: otro hilo pudo crear ya uno nuevo)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or (broken is not None and _pool is not broken):
+            return
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+class PoolJob:
+    """
+    Trabajo enviado al pool. Si el pool se rompe antes de terminar (un hijo
+    muerto, p. ej. por OOM), ``result()`` lo recalcula en línea en vez de
+    propagar ``BrokenProcessPool``.
+    """
+
+    def __init__(self, fut: Future, pool: ProcessPoolExecutor, df: pd.DataFrame,
+                 func: Callable, args: tuple, kwargs: dict):
+        self._fut, self._pool, self._df = fut, pool, df
+        self._call = (func, args, kwargs)
+        self._fallback: Optional[Future] = None
+
+    def done(self) -> bool:
+        return self._fallback is not None or self._fut.done()
+
+    def result(self, timeout: Optional[float] = None):
+        if self._fallback is None:
+            try:
+                return self._fut.result(timeout)
+            except BrokenProcessPool as e:
+                func, args, kwargs = self._call
+                logger.warning(f"⚠️ Compute pool broke during {getattr(func, '__name__', func)} ({e}); running inline")
+                _reset_pool(self._pool)
+                self._fallback = Future()
+                try:
+                    self._fallback.set_result(func(self._df, *args, **kwargs))
+                except Exception as err:
+                    self._fallback.set_exception(err)
+        return self._fallback.result()
+
+
+def shutdown() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+        _pool = None
+
+
+class FrameJobs:
+    """
+    Publica ``df`` en memoria compartida una vez y reparte varias funciones
+    ``func(df, *args, **kwargs)`` entre los procesos del pool. Los frames
+    pequeños (o con el pool desactivado) se calculan en línea. Úsese como
+    context manager: al salir espera los trabajos y libera la memoria.
+
+        with FrameJobs(df) as jobs:
+            a = jobs.submit(window_percentiles, doi, 7)
+            b = jobs.submit(monthly_climatology)
+        a.result(), b.result()
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        big = isinstance(df.index, pd.DatetimeIndex) and len(df) >= settings.COMPUTE_POOL_MIN_ROWS
+        self.pool = get_pool() if big else None
+        self.desc: Optional[SharedFrame] = None
+        self.shm: Optional[shared_memory.SharedMemory] = None
+        self.futures: List[PoolJob] = []
+
+    def __enter__(self) -> "FrameJobs":
+        if self.pool is not None:
+            self.desc, self.shm = SharedFrame.create(self.df)
+        return self
+
+    def _inline(self, func: Callable, *args, **kwargs) -> Future:
+        fut: Future = Future()
+        try:
+            fut.set_result(func(self.df, *args, **kwargs))
+        except Exception as e:
+            fut.set_exception(e)
+        return fut
+
+    def submit(self, func: Callable, *args, **kwargs) -> "Future | PoolJob":
+        if self.pool is None:
+            return self._inline(func, *args, **kwargs)
+        try:
+            fut = self.pool.submit(_run_shared, self.desc, func, args, kwargs)
+        except (BrokenProcessPool, RuntimeError) as e:
+            logger.warning(f"⚠️ Compute pool unavailable ({e}); running inline")
+            _reset_pool(self.pool)
+            self.pool = None
+            return self._inline(func, *args, **kwargs)
+        job = PoolJob(fut, self.pool, self.df, func, args, kwargs)
+        self.futures.append(job)
+        return job
+
+    def run(self, func: Callable, *args, **kwargs):
+        return self.submit(func, *args, **kwargs).result()
+
+    def __exit__(self, *exc) -> None:
+        # Esperar a los hijos antes de liberar la memoria compartida
+        for job in self.futures:
+            try:
+                job._fut.result()
+            except BrokenProcessPool:
+                _reset_pool(job._pool)
+            except Exception:
+                pass
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+
+
+def run_on_frame(func: Callable, df: pd.DataFrame, *args, **kwargs):
+    """Atajo para un único trabajo ``func(df, ...)``."""
+    with FrameJobs(df) as jobs:
+        return jobs.run(func, *args, **kwargs)
@@ -0,0 +1,149 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+import anyio
+from fastapi import Request
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineExceeded(RuntimeError):
+    """El presupuesto de tiempo de la petición se agotó."""
+
+
+class RequestCancelled(DeadlineExceeded):
+    """El cliente se desconectó: no tiene sentido seguir trabajando."""
+
+
+class Overloaded(RuntimeError):
+    """Admisión rechazada: demasiado trabajo upstream en curso."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Servidor saturado; reintentar en {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class Deadline:
+    """
+    Presupuesto de tiempo de una petición. Se pasa explícitamente hasta las
+    llamadas upstream, que piden ``timeout(cap)`` en vez de un timeout fijo.
+    """
+
+    def __init__(self, budget_s: float):
+        self.budget_s = budget_s
+        self.expires_at = time.monotonic() + budget_s
+        self._cancelled = threading.Event()
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def check(self) -> None:
+        if self.cancelled:
+            raise RequestCancelled("Cliente desconectado")
+        if self.remaining() <= 0:
+            raise DeadlineExceeded(f"Presupuesto de {self.budget_s:.0f}s agotado")
+
+    def timeout(self, cap: float) -> float:
+        """Timeout para la próxima llamada: ``min(cap, tiempo restante)``."""
+        self.check()
+        return min(cap, self.remaining())
+
+    def sleep(self, seconds: float) -> None:
+        """``time.sleep`` interrumpible por cancelación y acotado por el deadline."""
+        self.check()
+        self._cancelled.wait(min(seconds, self.remaining()))
+        self.check()
+
+
+def timeout_for(deadline: Optional[Deadline], cap: float) -> float:
+    return deadline.timeout(cap) if deadline is not None else cap
+
+
+def exhausted(deadline: Optional[Deadline], slack: float = 0.5) -> bool:
+    """
+    ¿Se agotó (o canceló) el deadline? Solo entonces un timeout es nuestro y
+    no del upstream; con presupuesto de sobra debe contar para el breaker.
+    """
+    return deadline is not None and (deadline.cancelled or deadline.remaining() <= slack)
+
+
+def sleep_for(deadline: Optional[Deadline], seconds: float) -> None:
+    if deadline is not None:
+        deadline.sleep(seconds)
+    else:
+        time.sleep(seconds)
+
+
+async def run_cancellable(request: Request, deadline: Deadline, fn: Callable, *args, **kwargs):
+    """
+    Ejecuta ``fn`` (bloqueante) en el threadpool y cancela ``deadline`` si el
+    cliente se desconecta, para que el trabajo upstream se corte en el
+    siguiente ``check()``.
+    """
+    async def watch() -> None:
+        while not deadline.cancelled:
+            if await request.is_disconnected():
+                logger.warning("🔌 Client disconnected; cancelling request work")
+                deadline.cancel()
+                return
+            await anyio.sleep(0.5)
+
+    # La excepción se relanza fuera del task group (anyio la envolvería en un ExceptionGroup)
+    outcome: dict = {}
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(watch)
+        try:
+            outcome["result"] = await run_in_threadpool(fn, *args, **kwargs)
+        except Exception as e:
+            outcome["error"] = e
+        finally:
+            tg.cancel_scope.cancel()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+
+class Admission:
+    """
+    Control de admisión: como mucho ``capacity`` trabajos upstream en curso y
+    ``queue`` esperando. Si la cola está llena se rechaza al instante
+    (``Overloaded``) para responder 503 + Retry-After en vez de encolar.
+    """
+
+    def __init__(self, capacity: int, queue: int, retry_after: float):
+        self.capacity = capacity
+        self.queue = queue
+        self.retry_after = retry_after
+        self._sem = threading.BoundedSemaphore(capacity)
+        self._waiting = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, deadline: Optional[Deadline] = None) -> Iterator[None]:
+        if not self._sem.acquire(blocking=False):
+            with self._lock:
+                if self._waiting >= self.queue:
+                    raise Overloaded(self.retry_after)
+                self._waiting += 1
+            try:
+                ok = self._sem.acquire(timeout=deadline.remaining() if deadline is not None else None)
+            finally:
+                with self._lock:
+                    self._waiting -= 1
+            if not ok:
+                raise Overloaded(self.retry_after)
+        try:
+            yield
+        finally:
+            self._sem.release()
@@ -0,0 +1,167 @@
+import gzip
+from datetime import date, datetime
+from typing import Dict, Optional
+
+import numpy as np
+import orjson
+import pandas as pd
+from fastapi import Request
+from fastapi.responses import Response
+
+from ..config.settings import settings
+
+try:  # opcionales: solo se usan si el cliente los pide
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover
+    pa = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+JSON_MEDIA = "application/json"
+MSGPACK_MEDIA = "application/msgpack"
+ARROW_MEDIA = "application/vnd.apache.arrow.stream"
+
+_MSGPACK_ALIASES = {MSGPACK_MEDIA, "application/x-msgpack", "application/vnd.msgpack"}
+
+_ORJSON_OPTS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(o):
+    if isinstance(o, np.generic):
+        return o.item()
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    if isinstance(o, (pd.Timestamp, datetime, date)):
+        return o.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(o).__name__}")
+
+
+def dumps_json(obj) -> bytes:
+    """JSON vía orjson. NaN/±Inf se emiten como ``null`` (JSON no los admite)."""
+    return orjson.dumps(obj, default=_default, option=_ORJSON_OPTS)
+
+
+def series_payload(s: pd.Series, layout: str = "records"):
+    """
+    Serie diaria lista para graficar, sin NaN:
+    - records:  [{"date": "YYYY-MM-DD", "value": v}, ...]
+    - columnar: {"date": [...], "value": [...]}
+    """
+    s = s.dropna()
+    dates = s.index.strftime("%Y-%m-%d").tolist()
+    values = s.to_numpy(dtype=float).tolist()
+    if layout == "columnar":
+        return {"date": dates, "value": values}
+    return [{"date": d, "value": v} for d, v in zip(dates, values)]
+
+
+def _weighted(header: str) -> list[tuple[str, float]]:
+    """
+    Entradas de un header Accept/Accept-Encoding como ``(token, q)``, de mayor
+    a menor ``q`` (a igual ``q`` se respeta el orden del cliente); ``q=0`` se descarta.
+    """
+    out = []
+    for part in header.split(","):
+        token, *params = [x.strip() for x in part.split(";")]
+        if not token:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            out.append((token.lower(), q))
+    return sorted(out, key=lambda e: -e[1])
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """Elige el media type de respuesta según el header Accept (JSON por defecto)."""
+    if not accept:
+        return JSON_MEDIA
+    for media, _ in _weighted(accept):
+        if media in _MSGPACK_ALIASES and msgpack is not None:
+            return MSGPACK_MEDIA
+        if media == ARROW_MEDIA and pa is not None:
+            return ARROW_MEDIA
+        if media in (JSON_MEDIA, "*/*", "application/*"):
+            return JSON_MEDIA
+    return JSON_MEDIA
+
+
+def _arrow_stream(payload: dict, tables: Dict[str, pd.Series]) -> bytes:
+    # Formato largo (series, date, value); el resto del payload viaja como
+    # JSON en la metadata del schema.
+    names, dates, values = [], [], []
+    for name, s in tables.items():
+        s = s.dropna()
+        names.extend([name] * len(s))
+        dates.extend(s.index.strftime("%Y-%m-%d").tolist())
+        values.extend(s.to_numpy(dtype=float).tolist())
+    rest = {k: v for k, v in payload.items() if k != "series_for_plots"}
+    table = pa.table(
+        {"series": pa.array(names, pa.string()),
+         "date": pa.array(dates, pa.string()),
+         "value": pa.array(values, pa.float64())},
+    ).replace_schema_metadata({"payload": dumps_json(rest)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode(payload: dict, media_type: str, tables: Optional[Dict[str, pd.Series]] = None) -> bytes:
+    if media_type == MSGPACK_MEDIA:
+        return msgpack.packb(payload, default=_default, use_bin_type=True)
+    if media_type == ARROW_MEDIA:
+        return _arrow_stream(payload, tables or {})
+    return dumps_json(payload)
+
+
+def compress(body: bytes, accept_encoding: Optional[str]) -> tuple[bytes, Optional[str]]:
+    """Comprime con brotli o gzip si el cliente lo acepta y el cuerpo es grande."""
+    if len(body) < settings.RESPONSE_COMPRESS_MIN_BYTES or not accept_encoding:
+        return body, None
+    weights = dict(reversed(_weighted(accept_encoding)))  # el de mayor q gana si hay repetidos
+    refused = {p.split(";", 1)[0].strip().lower() for p in accept_encoding.split(",")} - set(weights)
+    wildcard = weights.get("*", 0.0)
+    options = [("br", brotli is not None), ("gzip", True)]  # a igual q se prefiere br
+    q, coding = max(
+        ((weights.get(c, 0.0 if c in refused else wildcard), c) for c, ok in options if ok),
+        key=lambda e: e[0], default=(0.0, None),
+    )
+    if not q:
+        return body, None
+    if coding == "br":
+        return brotli.compress(body, quality=4), "br"
+    return gzip.compress(body, compresslevel=5), "gzip"
+
+
+def respond(request: Request, body: bytes, media_type: str) -> Response:
+    """Respuesta a partir de un cuerpo ya codificado (p. ej. desde la caché)."""
+    body, encoding = compress(body, request.headers.get("accept-encoding"))
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def render(request: Request, payload: dict, tables: Optional[Dict[str, pd.Series]] = None) -> Response:
+    """
+    Serializa ``payload`` sin pasar por ``jsonable_encoder``: negocia formato
+    (JSON / MessagePack / Arrow IPC) y compresión a partir de los headers.
+    ``tables`` son las series crudas para el formato Arrow.
+    """
+    media_type = negotiate(request.headers.get("accept"))
+    return respond(request, encode(payload, media_type, tables), media_type)
@@ -35,3 +35,17 @@ def wilson_interval(k: int, n: int, z: float = 1.96) -> Tuple[float, float, floa
     lo = (center - adj) / denom
     hi = (center + adj) / denom
     return (p, max(0.0, lo), min(1.0, hi))
+
+def wilson_intervals(k: np.ndarray, n: int, z: float = 1.96) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Versión vectorizada de ``wilson_interval`` para muchos ``k`` con el mismo ``n``."""
+    k = np.asarray(k, dtype=float)
+    if n == 0:
+        nan = np.full(k.shape, np.nan)
+        return (nan, nan, nan)
+    p = k / n
+    denom = 1 + z**2 / n
+    center = p + z**2/(2*n)
+    adj = z*np.sqrt((p*(1-p) + z**2/(4*n)) / n)
+    lo = (center - adj) / denom
+    hi = (center + adj) / denom
+    return (p, np.maximum(0.0, lo), np.minimum(1.0, hi))
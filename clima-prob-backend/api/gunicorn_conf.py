@@ -1,4 +1,6 @@
-workers = 2
+import os
+
+workers = int(os.environ.get("WEB_WORKERS", 2))
 threads = 1
 timeout = 120
 bind = "0.0.0.0:8080"
@@ -3,3 +3,15 @@ import os, sys
 BASE = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if BASE not in sys.path:
     sys.path.insert(0, BASE)
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    """Cada test con su propia caché en proceso (sin Redis)."""
+    from app.cache.tiered import TwoTierCache, set_cache
+    cache = TwoTierCache()
+    set_cache(cache)
+    yield cache
+    set_cache(None)
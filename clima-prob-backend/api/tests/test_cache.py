@@ -0,0 +1,119 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.cache.codecs import decode_frame, encode_frame
+from app.cache.tiered import TwoTierCache
+from app.utils.deadline import Deadline, DeadlineExceeded
+
+fakeredis = pytest.importorskip("fakeredis")
+
+def _df():
+    idx = pd.date_range("2020-01-01", periods=3, freq="D", tz="UTC")
+    df = pd.DataFrame({"Tmax_C": [30.0, np.nan, 31.5], "P_mmday": [0.0, 2.0, 4.0]}, index=idx)
+    df.attrs = {"fetched_at": 123.0}
+    return df
+
+def test_frame_codec_roundtrip():
+    df = _df()
+    back = decode_frame(encode_frame(df))
+    pd.testing.assert_frame_equal(back, df, check_freq=False)
+    assert back.attrs == {"fetched_at": 123.0}
+
+def test_l2_shared_between_workers():
+    server = fakeredis.FakeServer()
+    a = TwoTierCache(fakeredis.FakeRedis(server=server))
+    b = TwoTierCache(fakeredis.FakeRedis(server=server))
+    a.set("series", ("X", 1.0), _df())
+    a.set("ecdf", ("k",), {"Tmax_C": np.array([1.0, 2.0])})
+    pd.testing.assert_frame_equal(b.get("series", ("X", 1.0)), _df(), check_freq=False)
+    np.testing.assert_equal(b.get("ecdf", ("k",))["Tmax_C"], [1.0, 2.0])
+    assert b.redis.ttl(b.key("series", ("X", 1.0))) > 0
+
+def test_version_bump_misses():
+    r = fakeredis.FakeRedis()
+    TwoTierCache(r, version=1).set("thresholds", ("k",), {"very_hot_Tmax_C": 30.0})
+    assert TwoTierCache(r, version=1).get("thresholds", ("k",)) == {"very_hot_Tmax_C": 30.0}
+    assert TwoTierCache(r, version=2).get("thresholds", ("k",)) is None
+
+def test_get_or_set_computes_once_across_workers():
+    server = fakeredis.FakeServer()
+    caches = [TwoTierCache(fakeredis.FakeRedis(server=server)) for _ in range(2)]
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return b"body"
+
+    results = []
+    threads = [threading.Thread(target=lambda c=c: results.append(c.get_or_set("response", ("r",), compute)))
+               for c in caches for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1 and results == [b"body"] * 8
+
+def test_get_or_set_does_not_serialize_unrelated_keys():
+    cache = TwoTierCache(fakeredis.FakeRedis())
+
+    def slow(v):
+        time.sleep(0.3)
+        return v
+
+    t0 = time.monotonic()
+    threads = [threading.Thread(target=lambda i=i: cache.get_or_set("response", (i,), lambda: slow(b"x")))
+               for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert time.monotonic() - t0 < 0.6
+
+def test_waiters_are_bounded_by_deadline():
+    server = fakeredis.FakeServer()
+    leader, follower = (TwoTierCache(fakeredis.FakeRedis(server=server)) for _ in range(2))
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        time.sleep(0.5)
+        return b"body"
+
+    t = threading.Thread(target=lambda: leader.get_or_set("response", ("r",), slow, deadline=Deadline(5)))
+    t.start()
+    started.wait()
+    t0 = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        follower.get_or_set("response", ("r",), lambda: b"other", deadline=Deadline(0.1))
+    assert time.monotonic() - t0 < 0.3
+    # Sin prisa, el otro worker espera al líder aunque tarde más que la espera antigua
+    assert follower.get_or_set("response", ("r",), lambda: b"other", deadline=Deadline(5)) == b"body"
+    t.join()
+
+def test_redis_failure_degrades_to_l1():
+    r = fakeredis.FakeRedis()
+    r.connected = False
+    cache = TwoTierCache(r)
+    cache.set("response", ("r",), b"body")
+    assert cache.get("response", ("r",)) == b"body"
+    assert cache.get_or_set("response", ("q",), lambda: b"x") == b"x"
+
+def test_l1_is_bounded_by_bytes():
+    def frame(n):
+        idx = pd.date_range("2000-01-01", periods=n, freq="D", tz="UTC")
+        return pd.DataFrame({"Tmax_C": np.zeros(n)}, index=idx)
+
+    cache = TwoTierCache(l1_bytes=100_000)
+    for i in range(5):
+        cache.set("series", (i,), frame(2_000))  # ~32 KB cada uno
+    assert cache.l1.nbytes <= 100_000
+    assert cache.get("series", (0,)) is None and cache.get("series", (4,)) is not None
+    # Con L2 los valores grandes no ocupan L1 pero se siguen sirviendo desde Redis
+    shared = TwoTierCache(fakeredis.FakeRedis(), l1_bytes=100_000)
+    shared.set("series", ("big",), frame(5_000))
+    assert shared.l1.nbytes == 0 and len(shared.get("series", ("big",))) == 5_000
@@ -0,0 +1,110 @@
+import pandas as pd
+import pytest
+import requests
+
+from app.config.settings import settings
+from app.nasa import catalog as catalog_mod
+from app.nasa.catalog import DatasetCatalog, Product
+
+def _families():
+    return {
+        "gldas_Tair_f_inst": [
+            Product("G21", "2000-01-01"),
+            Product("G20", "1948-01-01", "2014-12-31"),
+        ],
+        "imerg": [Product("BAD", "1998-01-01"), Product("GOOD", "1998-01-01")],
+    }
+
+def _fake_ts(calls):
+    def fake(data_id, lat, lon, start_iso, end_iso, token=None, **kw):
+        calls.append((data_id, start_iso, end_iso))
+        if data_id == "BAD":
+            resp = requests.Response(); resp.status_code = 400
+            raise requests.exceptions.HTTPError("bad data id", response=resp)
+        idx = pd.date_range(start_iso[:10], end_iso[:10], freq="D", tz="UTC")
+        return pd.DataFrame({f"{data_id}_col": range(len(idx))}, index=idx, dtype=float)
+    return fake
+
+def test_plan_splits_range_by_product_coverage():
+    cat = DatasetCatalog(_families())
+    plan = cat.plan("gldas_Tair_f_inst", "1995-03-01T00:00:00", "2003-12-31T23:59:59")
+    assert plan == [
+        ("G20", "1995-03-01T00:00:00", "1999-12-31T23:59:59"),
+        ("G21", "2000-01-01T00:00:00", "2003-12-31T23:59:59"),
+    ]
+
+def test_fetch_remembers_invalid_product(monkeypatch):
+    calls = []
+    monkeypatch.setattr(catalog_mod, "giovanni_timeseries", _fake_ts(calls))
+    cat = DatasetCatalog(_families())
+    df = cat.fetch("imerg", 0, 0, "2020-01-01T00:00:00", "2020-01-10T23:59:59")
+    assert [c[0] for c in calls] == ["BAD", "GOOD"]
+    assert list(df.columns) == ["imerg"] and len(df) == 10
+
+    calls.clear()
+    cat.fetch("imerg", 0, 0, "2020-01-01T00:00:00", "2020-01-10T23:59:59")
+    assert [c[0] for c in calls] == ["GOOD"]
+
+def test_fetch_concatenates_segments_sorted(monkeypatch):
+    monkeypatch.setattr(catalog_mod, "giovanni_timeseries", _fake_ts([]))
+    cat = DatasetCatalog(_families())
+    df = cat.fetch("gldas_Tair_f_inst", 0, 0, "1999-12-25T00:00:00", "2000-01-05T23:59:59")
+    assert len(df) == 12 and df.index.is_monotonic_increasing
+
+def _point_error(calls, bad_points):
+    def fake(data_id, lat, lon, start_iso, end_iso, token=None, **kw):
+        calls.append((data_id, lat, lon))
+        if data_id == "BAD" and (lat, lon) in bad_points:
+            resp = requests.Response(); resp.status_code = 400
+            raise requests.exceptions.HTTPError("400 Client Error: Bad Request", response=resp)
+        idx = pd.date_range(start_iso[:10], end_iso[:10], freq="D", tz="UTC")
+        return pd.DataFrame({"v": range(len(idx))}, index=idx, dtype=float)
+    return fake
+
+def test_point_failure_does_not_invalidate_product(monkeypatch):
+    calls = []
+    monkeypatch.setattr(catalog_mod, "giovanni_timeseries", _point_error(calls, {(0, -30)}))
+    cat = DatasetCatalog(_families())
+    cat.fetch("imerg", 0, -30, "2020-01-01T00:00:00", "2020-01-10T23:59:59")
+    assert cat.product("BAD").valid is None
+    calls.clear()
+    cat.fetch("imerg", 19, -98, "2020-01-01T00:00:00", "2020-01-10T23:59:59")
+    assert [c[0] for c in calls] == ["BAD"]
+
+def test_failures_at_several_points_invalidate(monkeypatch):
+    monkeypatch.setattr(settings, "CATALOG_INVALID_POINTS", 2)
+    points = {(0, -30), (5, 5)}
+    monkeypatch.setattr(catalog_mod, "giovanni_timeseries", _point_error([], points))
+    cat = DatasetCatalog(_families())
+    for lat, lon in points:
+        cat.fetch("imerg", lat, lon, "2020-01-01T00:00:00", "2020-01-10T23:59:59")
+    assert cat.product("BAD").valid is False
+
+def test_last_candidate_is_never_invalidated():
+    cat = DatasetCatalog(_families())
+    cat.mark("BAD", False)
+    cat.mark("GOOD", False)
+    assert cat.product("GOOD").valid is not False
+    assert cat.plan("imerg", "2020-01-01T00:00:00", "2020-01-10T23:59:59")[0][0] == "GOOD"
+
+def test_upstream_fault_is_not_papered_over_by_shorter_product(monkeypatch):
+    calls = []
+
+    def fake(data_id, lat, lon, start_iso, end_iso, token=None, **kw):
+        calls.append(data_id)
+        resp = requests.Response(); resp.status_code = 503
+        raise requests.exceptions.HTTPError("503 Service Unavailable", response=resp)
+
+    monkeypatch.setattr(catalog_mod, "giovanni_timeseries", fake)
+    cat = DatasetCatalog(_families())
+    with pytest.raises(requests.exceptions.HTTPError):
+        cat.fetch("gldas_Tair_f_inst", 0, 0, "2005-01-01T00:00:00", "2020-12-31T23:59:59")
+    assert calls == ["G21"]
+
+def test_replan_that_leaves_a_gap_raises(monkeypatch):
+    calls = []
+    monkeypatch.setattr(catalog_mod, "giovanni_timeseries", _point_error(calls, {(0, 0)}))
+    cat = DatasetCatalog({"fam": [Product("BAD", "2000-01-01"), Product("OLD", "1990-01-01", "2014-12-31")]})
+    with pytest.raises(RuntimeError, match="ningún otro producto"):
+        cat.fetch("fam", 0, 0, "2005-01-01T00:00:00", "2020-12-31T23:59:59")
+    assert [c[0] for c in calls] == ["BAD"]
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+from app.config.settings import settings
+from app.nasa.gldas import gldas_daily_from_3h
+from app.prob.analytics import window_percentiles
+from app.utils import compute_pool
+from app.utils.compute_pool import FrameJobs, SharedFrame
+
+def _hourly():
+    idx = pd.date_range("2019-01-01", "2020-12-31 21:00", freq="3h", tz="UTC")
+    rng = np.random.default_rng(1)
+    n = len(idx)
+    return pd.DataFrame({
+        "T_K": rng.normal(295, 5, n), "WS": rng.gamma(2, 2, n),
+        "Qair": rng.uniform(0.005, 0.02, n), "Psurf": rng.normal(80000, 300, n),
+    }, index=idx)
+
+def test_shared_frame_roundtrip():
+    df = _hourly()
+    desc, shm = SharedFrame.create(df)
+    try:
+        back, shm2 = desc.attach()
+        pd.testing.assert_frame_equal(back, df, check_freq=False)
+        del back
+        shm2.close()
+    finally:
+        shm.close(); shm.unlink()
+
+def test_frame_jobs_pool_matches_inline(monkeypatch):
+    monkeypatch.setattr(settings, "COMPUTE_POOL_WORKERS", 2)
+    monkeypatch.setattr(settings, "COMPUTE_POOL_MIN_ROWS", 0)
+    hourly = _hourly()
+    try:
+        with FrameJobs(hourly) as jobs:
+            assert jobs.pool is not None
+            daily_f = jobs.submit(gldas_daily_from_3h)
+        daily = daily_f.result()
+        pd.testing.assert_frame_equal(daily, gldas_daily_from_3h(hourly), check_freq=False)
+
+        with FrameJobs(daily) as jobs:
+            stats = jobs.run(window_percentiles, "2020-07-01", 7)
+        np.testing.assert_equal(stats, window_percentiles(daily, "2020-07-01", 7))
+    finally:
+        compute_pool.shutdown()
+
+def test_frame_jobs_inline_when_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "COMPUTE_POOL_WORKERS", 0)
+    with FrameJobs(_hourly()) as jobs:
+        assert jobs.pool is None
+        assert jobs.run(len) == len(_hourly())
+
+def test_default_pool_size_split_between_web_workers(monkeypatch):
+    monkeypatch.setattr(settings, "COMPUTE_POOL_WORKERS", None)
+    monkeypatch.setattr(settings, "WEB_WORKERS", 2)
+    monkeypatch.setattr(compute_pool.os, "cpu_count", lambda: 8)
+    assert compute_pool.pool_size() == 4
+    monkeypatch.setattr(compute_pool.os, "cpu_count", lambda: 1)
+    assert compute_pool.pool_size() == 1
+
+def test_broken_pool_falls_back_inline(monkeypatch):
+    from concurrent.futures import Future
+    from concurrent.futures.process import BrokenProcessPool
+
+    class DeadPool:
+        def submit(self, *a, **kw):
+            fut = Future()
+            fut.set_exception(BrokenProcessPool("child killed"))
+            return fut
+
+    monkeypatch.setattr(settings, "COMPUTE_POOL_MIN_ROWS", 0)
+    monkeypatch.setattr(compute_pool, "get_pool", lambda: DeadPool())
+    hourly = _hourly()
+    with FrameJobs(hourly) as jobs:
+        assert isinstance(jobs.pool, DeadPool)
+        job = jobs.submit(len)
+        assert job.result() == len(hourly)
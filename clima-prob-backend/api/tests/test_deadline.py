@@ -0,0 +1,61 @@
+import threading
+import time
+from unittest import mock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routes import probabilities as prob_routes
+from app.utils.deadline import Admission, Deadline, DeadlineExceeded, Overloaded
+
+BODY = {"lat": 19.0, "lon": -98.0, "start_date": "2020-01-01", "end_date": "2020-12-31",
+        "date_of_interest": "2020-05-15"}
+
+def test_deadline_caps_timeouts_and_cancels():
+    d = Deadline(0.2)
+    assert d.timeout(120) <= 0.2
+    d.cancel()
+    with pytest.raises(DeadlineExceeded):
+        d.check()
+    with pytest.raises(DeadlineExceeded):
+        Deadline(0.01).sleep(5)
+
+def test_admission_sheds_when_queue_full():
+    adm = Admission(capacity=1, queue=0, retry_after=3)
+    with adm.slot():
+        with pytest.raises(Overloaded):
+            with adm.slot():
+                pass
+    with adm.slot():
+        pass
+
+def test_admission_waits_in_queue_until_slot_frees():
+    adm = Admission(capacity=1, queue=1, retry_after=3)
+    held = threading.Event()
+
+    def holder():
+        with adm.slot():
+            held.set()
+            time.sleep(0.1)
+
+    t = threading.Thread(target=holder); t.start(); held.wait()
+    with adm.slot(Deadline(5)):
+        pass
+    t.join()
+
+def test_route_returns_503_with_retry_after_when_overloaded(monkeypatch):
+    adm = Admission(capacity=1, queue=0, retry_after=7)
+    monkeypatch.setattr(prob_routes, "_admission", adm)
+    with adm.slot():
+        r = TestClient(app).post("/api/probabilities/exceedance", json={**BODY, "thresholds": {"Tmax_C": [30]}})
+    assert r.status_code == 503 and r.headers["Retry-After"] == "7"
+
+def test_route_passes_deadline_and_maps_timeout_to_504():
+    def slow_build(lat, lon, start_iso, end_iso, deadline=None):
+        assert deadline is not None and deadline.remaining() <= 2
+        raise DeadlineExceeded("budget")
+
+    with mock.patch("app.routes.probabilities.build_dataset", side_effect=slow_build):
+        r = TestClient(app).post("/api/probabilities", json=BODY, headers={"X-Request-Timeout": "2"})
+    assert r.status_code == 504
@@ -0,0 +1,79 @@
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.prob.ecdf import exceedance, window_ecdfs
+from app.prob.empirical import empirical_probabilities
+from app.prob.thresholds import Thresholds
+
+def _df():
+    idx = pd.date_range("2000-01-01", "2019-12-31", freq="D", tz="UTC")
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({"Tmax_C": rng.normal(25, 4, len(idx)).round(1),
+                         "Tmin_C": rng.normal(10, 4, len(idx)).round(1)}, index=idx)
+
+def test_exceedance_matches_empirical_engine():
+    df = _df()
+    ecdfs = window_ecdfs(df, "2019-05-15", 7)
+    emp = empirical_probabilities(df, "2019-05-15", Thresholds(very_hot_Tmax_C=28.0, very_cold_Tmin_C=7.0), 7)
+    hot = exceedance(ecdfs["Tmax_C"], [28.0], ">=")
+    cold = exceedance(ecdfs["Tmin_C"], [7.0], "<=")
+    assert hot["k"][0] == emp["very_hot"]["k"] and hot["n"] == emp["very_hot"]["n"]
+    assert cold["k"][0] == emp["very_cold"]["k"]
+    assert np.isclose(hot["lo"][0], emp["very_hot"]["lo"]) and np.isclose(hot["hi"][0], emp["very_hot"]["hi"])
+
+def test_exceedance_matches_empirical_with_partial_nan():
+    df = _df()
+    df["P_mmday"] = np.random.default_rng(1).gamma(1, 3, len(df))
+    df.loc[:"2005-12-31", "P_mmday"] = np.nan      # sin cobertura IMERG al principio
+    df.loc["2010-05-10":"2010-05-12", "Tmax_C"] = np.nan
+    ecdfs = window_ecdfs(df, "2019-05-15", 7)
+    emp = empirical_probabilities(df, "2019-05-15", Thresholds(very_hot_Tmax_C=28.0, very_wet_precip_mmday=5.0), 7)
+    wet = exceedance(ecdfs["P_mmday"], [5.0], ">=")
+    hot = exceedance(ecdfs["Tmax_C"], [28.0], ">=")
+    assert (wet["n"], wet["k"][0]) == (emp["very_wet"]["n"], emp["very_wet"]["k"])
+    assert (hot["n"], hot["k"][0]) == (emp["very_hot"]["n"], emp["very_hot"]["k"])
+    assert np.isclose(wet["prob"][0], emp["very_wet"]["prob"])
+
+def test_exceedance_endpoint_sweep():
+    body = {"lat": 19.0, "lon": -98.0, "start_date": "2000-01-01", "end_date": "2019-12-31",
+            "date_of_interest": "2019-05-15", "window_days": 7,
+            "thresholds": {"Tmax_C": [20, 25, 30, 35]}}
+    with mock.patch("app.routes.probabilities.build_dataset", return_value=_df()) as build:
+        c = TestClient(app)
+        j = c.post("/api/probabilities/exceedance", json=body).json()
+        c.post("/api/probabilities/exceedance", json=body)
+    assert build.call_count == 1
+    prob = j["exceedance"]["Tmax_C"]["prob"]
+    assert j["exceedance"]["Tmax_C"]["event"] == "very_hot"
+    assert prob == sorted(prob, reverse=True)
+
+def test_exceedance_endpoint_rejects_unknown_variable():
+    body = {"lat": 19.0, "lon": -98.0, "start_date": "2000-01-01", "end_date": "2019-12-31",
+            "date_of_interest": "2019-05-15", "thresholds": {"foo": [1]}}
+    r = TestClient(app).post("/api/probabilities/exceedance", json=body)
+    assert r.status_code == 400
+
+def _const_df(tmax, stale):
+    df = _df()
+    df["Tmax_C"] = tmax
+    df.attrs = {"stale": stale}
+    return df
+
+def test_stale_data_does_not_feed_later_fresh_requests():
+    body = {"lat": 19.0, "lon": -98.0, "start_date": "2000-01-01", "end_date": "2019-12-31",
+            "date_of_interest": "2019-05-15", "window_days": 7, "thresholds": {"Tmax_C": [20.0]}}
+    prob_body = {k: v for k, v in body.items() if k != "thresholds"}
+    c = TestClient(app)
+    with mock.patch("app.routes.probabilities.build_dataset", return_value=_const_df(10.0, True)):
+        j = c.post("/api/probabilities/exceedance", json=body).json()
+        assert j["meta"]["stale"] is True and j["exceedance"]["Tmax_C"]["prob"] == [0.0]
+        assert c.post("/api/probabilities", json=prob_body).json()["meta"]["thresholds"]["very_hot_Tmax_C"] == 10.0
+    with mock.patch("app.routes.probabilities.build_dataset", return_value=_const_df(30.0, False)):
+        j = c.post("/api/probabilities/exceedance", json=body).json()
+        assert j["meta"]["stale"] is False and j["exceedance"]["Tmax_C"]["prob"] == [1.0]
+        meta = c.post("/api/probabilities", json=prob_body).json()["meta"]
+        assert meta["stale"] is False and meta["thresholds"]["very_hot_Tmax_C"] == 30.0
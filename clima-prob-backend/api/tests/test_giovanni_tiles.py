@@ -0,0 +1,92 @@
+import pandas as pd
+import pytest
+import requests
+
+from app.config.settings import settings
+from app.nasa import giovanni, resilience
+from app.nasa.giovanni import calendar_tiles, giovanni_timeseries
+
+def test_calendar_tiles_are_whole_years():
+    assert calendar_tiles("1999-06-01T00:00:00", "2001-02-01T23:59:59") == [
+        ("1999-01-01T00:00:00", "1999-12-31T23:59:59"),
+        ("2000-01-01T00:00:00", "2000-12-31T23:59:59"),
+        ("2001-01-01T00:00:00", "2001-12-31T23:59:59"),
+    ]
+    assert len(calendar_tiles("2020-01-10T00:00:00", "2020-12-31T23:59:59", "month")) == 12
+
+def test_tiles_fetched_retried_and_assembled(monkeypatch):
+    monkeypatch.setattr(resilience, "_breakers", {})
+    monkeypatch.setattr(settings, "GIOVANNI_TILE_RETRIES", 1)
+    monkeypatch.setattr(giovanni, "sleep_for", lambda deadline, s: None)
+    monkeypatch.setattr(giovanni, "giovanni_token", lambda deadline=None: "tok")
+    calls = []
+
+    def fake_fetch(data_id, lat, lon, start_iso, end_iso, token=None, deadline=None):
+        calls.append(start_iso[:4])
+        if start_iso.startswith("2001") and calls.count("2001") == 1:
+            raise requests.exceptions.ConnectionError("reset")
+        # Un día de solape con el tramo siguiente para comprobar deduplicación
+        idx = pd.date_range(start_iso[:10], pd.Timestamp(end_iso[:10]) + pd.Timedelta(days=1), freq="D", tz="UTC")
+        return pd.DataFrame({"v": 1.0}, index=idx)
+
+    monkeypatch.setattr(giovanni, "_fetch_timeseries", fake_fetch)
+    df = giovanni_timeseries("X", 0, 0, "2000-01-01T00:00:00", "2002-12-31T23:59:59", chunk="year")
+    assert sorted(calls) == ["2000", "2001", "2001", "2002"]
+    assert df.index.is_monotonic_increasing and not df.index.duplicated().any()
+    assert df.index[0] == pd.Timestamp("2000-01-01", tz="UTC")
+    assert df.attrs["stale"] is False
+
+def test_edge_tiles_reused_across_ranges(monkeypatch):
+    monkeypatch.setattr(giovanni, "giovanni_token", lambda deadline=None: "tok")
+    calls = []
+
+    def fake_fetch(data_id, lat, lon, start_iso, end_iso, token=None, deadline=None):
+        calls.append((start_iso, end_iso))
+        idx = pd.date_range(start_iso[:10], end_iso[:10], freq="D", tz="UTC")
+        return pd.DataFrame({"v": 1.0}, index=idx)
+
+    monkeypatch.setattr(giovanni, "_fetch_timeseries", fake_fetch)
+    df = giovanni_timeseries("X", 0, 0, "2000-03-01T00:00:00", "2001-06-30T23:59:59", chunk="year",
+                             coverage=("2000-02-01", None))
+    assert calls == [("2000-02-01T00:00:00", "2000-12-31T23:59:59"), ("2001-01-01T00:00:00", "2001-12-31T23:59:59")]
+    assert df.index[0] == pd.Timestamp("2000-03-01", tz="UTC") and df.index[-1] == pd.Timestamp("2001-06-30", tz="UTC")
+
+    df = giovanni_timeseries("X", 0, 0, "2000-05-01T00:00:00", "2001-09-30T23:59:59", chunk="year",
+                             coverage=("2000-02-01", None))
+    assert len(calls) == 2 and df.index[-1] == pd.Timestamp("2001-09-30", tz="UTC")
+
+def test_transient_tile_failures_do_not_open_breaker(monkeypatch):
+    monkeypatch.setattr(resilience, "_breakers", {})
+    monkeypatch.setattr(settings, "GIOVANNI_TILE_RETRIES", 1)
+    monkeypatch.setattr(giovanni, "sleep_for", lambda deadline, s: None)
+    monkeypatch.setattr(giovanni, "giovanni_token", lambda deadline=None: "tok")
+    calls = []
+    flaky = {"2001", "2005", "2009"}
+
+    def fake_fetch(data_id, lat, lon, start_iso, end_iso, token=None, deadline=None):
+        year = start_iso[:4]
+        calls.append(year)
+        if year in flaky and calls.count(year) == 1:
+            raise requests.exceptions.ConnectionError("reset")
+        idx = pd.date_range(start_iso[:10], end_iso[:10], freq="D", tz="UTC")
+        return pd.DataFrame({"v": 1.0}, index=idx)
+
+    monkeypatch.setattr(giovanni, "_fetch_timeseries", fake_fetch)
+    df = giovanni_timeseries("X", 0, 0, "2000-01-01T00:00:00", "2019-12-31T23:59:59", chunk="year")
+    assert len(df) == 7305
+    assert resilience.get_breaker(resilience.host_key(giovanni.TS_URL)).state == "closed"
+
+def test_exhausted_tile_retries_count_once(monkeypatch):
+    monkeypatch.setattr(resilience, "_breakers", {})
+    monkeypatch.setattr(settings, "GIOVANNI_TILE_RETRIES", 1)
+    monkeypatch.setattr(giovanni, "sleep_for", lambda deadline, s: None)
+    monkeypatch.setattr(giovanni, "giovanni_token", lambda deadline=None: "tok")
+
+    def down(*a, **kw):
+        raise requests.exceptions.ConnectionError("reset")
+
+    monkeypatch.setattr(giovanni, "_fetch_timeseries", down)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        giovanni_timeseries("X", 0, 0, "2000-01-01T00:00:00", "2004-12-31T23:59:59", chunk="year")
+    assert resilience.get_breaker(resilience.host_key(giovanni.TS_URL)).failures == 1
+    assert resilience.get_breaker(resilience.data_key("X")).failures == 1
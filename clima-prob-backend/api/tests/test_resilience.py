@@ -0,0 +1,84 @@
+import time
+
+import pandas as pd
+import pytest
+import requests
+
+from app.config.settings import settings
+from app.nasa import resilience
+from app.nasa.resilience import CircuitBreaker, CircuitOpenError, guarded_call, serve_series
+
+def _df(v=1.0):
+    idx = pd.date_range("2020-01-01", periods=2, freq="D", tz="UTC")
+    return pd.DataFrame({"x": [v, v]}, index=idx)
+
+def _boom():
+    raise requests.exceptions.ConnectTimeout("timeout")
+
+def test_breaker_opens_and_half_opens():
+    br = CircuitBreaker("k", failure_threshold=2, reset_timeout=0.05)
+    assert br.allow()
+    br.record_failure(); br.record_failure()
+    assert br.state == "open" and not br.allow()
+    time.sleep(0.06)
+    assert br.allow()          # una sola llamada de prueba
+    assert not br.allow()
+    br.record_success()
+    assert br.state == "closed"
+
+def test_guarded_call_fails_fast_when_open(monkeypatch):
+    monkeypatch.setattr(resilience, "_breakers", {})
+    for _ in range(settings.CB_FAILURE_THRESHOLD):
+        with pytest.raises(requests.exceptions.RequestException):
+            guarded_call(_boom, host="host:test", data="data:test")
+    with pytest.raises(CircuitOpenError):
+        guarded_call(lambda: _df(), host="host:test", data="data:test")
+
+def test_serve_series_stale_while_revalidate(monkeypatch, fresh_cache):
+    key = ("id", 1.0, 2.0, "a", "b")
+    assert serve_series(key, lambda: _df(1.0)).attrs["stale"] is False
+
+    # Copia vencida: se sirve marcada y se refresca en segundo plano
+    monkeypatch.setattr(settings, "SERIES_FRESH_TTL_S", 0)
+    out = serve_series(key, lambda: _df(2.0))
+    assert out.attrs["stale"] is True and out["x"].iloc[0] == 1.0
+    resilience._refresher.submit(lambda: None).result()
+    for _ in range(50):
+        if key not in resilience._refreshing:
+            break
+        time.sleep(0.01)
+    assert fresh_cache.get("series", key)["x"].iloc[0] == 2.0
+
+def test_serve_series_falls_back_to_stale_on_error(monkeypatch):
+    key = ("id", 1.0, 2.0, "a", "b")
+    serve_series(key, lambda: _df(1.0))
+    monkeypatch.setattr(settings, "SERIES_FRESH_TTL_S", 0)
+    monkeypatch.setattr(settings, "SERIES_STALE_TTL_S", 0)
+    out = serve_series(key, _boom)
+    assert out.attrs["stale"] is True
+
+def test_hung_upstream_with_budget_left_opens_breaker(monkeypatch):
+    from app.nasa import giovanni
+    from app.utils.deadline import Deadline
+
+    monkeypatch.setattr(resilience, "_breakers", {})
+    monkeypatch.setattr(giovanni, "giovanni_token", lambda deadline=None: "tok")
+
+    def hang(*a, **kw):
+        raise requests.exceptions.ReadTimeout("read timed out")
+
+    monkeypatch.setattr(giovanni.requests, "get", hang)
+    for _ in range(settings.CB_FAILURE_THRESHOLD):
+        with pytest.raises(requests.exceptions.Timeout):
+            giovanni.giovanni_timeseries("X", 0, 0, "2020-01-01T00:00:00", "2020-01-31T23:59:59",
+                                         chunk=None, deadline=Deadline(100))
+    with pytest.raises(CircuitOpenError):
+        giovanni.giovanni_timeseries("X", 0, 0, "2020-01-01T00:00:00", "2020-01-31T23:59:59",
+                                     chunk=None, deadline=Deadline(100))
+
+def test_cold_series_written_once(monkeypatch, fresh_cache):
+    writes = []
+    set_ = fresh_cache.set
+    monkeypatch.setattr(fresh_cache, "set", lambda ns, *a, **kw: (writes.append(ns), set_(ns, *a, **kw)))
+    out = serve_series(("id", 0.0, 0.0, "a", "b"), lambda: _df(1.0))
+    assert writes == ["series"] and out.attrs["stale"] is False and "fetched_at" in out.attrs
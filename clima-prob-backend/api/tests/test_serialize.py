@@ -0,0 +1,44 @@
+import gzip
+import json
+
+import numpy as np
+import pandas as pd
+
+from app.utils.serialize import (
+    ARROW_MEDIA, JSON_MEDIA, MSGPACK_MEDIA, compress, dumps_json, negotiate, series_payload,
+)
+
+def _series():
+    idx = pd.date_range("2024-05-01", periods=3, freq="D", tz="UTC")
+    return pd.Series([1.5, np.nan, 3.0], index=idx)
+
+def test_dumps_json_nan_as_null():
+    out = json.loads(dumps_json({"a": np.nan, "b": np.float64(2.0), "c": np.int64(3), "d": np.array([1.0, np.inf])}))
+    assert out == {"a": None, "b": 2.0, "c": 3, "d": [1.0, None]}
+
+def test_series_payload_layouts():
+    assert series_payload(_series()) == [{"date": "2024-05-01", "value": 1.5}, {"date": "2024-05-03", "value": 3.0}]
+    assert series_payload(_series(), "columnar") == {"date": ["2024-05-01", "2024-05-03"], "value": [1.5, 3.0]}
+
+def test_negotiate():
+    assert negotiate(None) == JSON_MEDIA
+    assert negotiate("application/msgpack") == MSGPACK_MEDIA
+    assert negotiate(f"{ARROW_MEDIA};q=1, application/json") == ARROW_MEDIA
+    assert negotiate("text/html") == JSON_MEDIA
+
+def test_negotiate_honours_q_values():
+    assert negotiate("application/msgpack;q=0, application/json") == JSON_MEDIA
+    assert negotiate("application/json;q=0.5, application/msgpack;q=0.9") == MSGPACK_MEDIA
+
+def test_compress_gzip_only_large_bodies():
+    small = b"{}"
+    assert compress(small, "gzip") == (small, None)
+    big = dumps_json({"x": list(range(2000))})
+    body, enc = compress(big, "gzip")
+    assert enc == "gzip" and gzip.decompress(body) == big
+
+def test_compress_honours_q_values():
+    big = dumps_json({"x": list(range(2000))})
+    assert compress(big, "gzip;q=0") == (big, None)
+    assert compress(big, "br;q=0.1, gzip;q=0.8")[1] == "gzip"
+    assert compress(big, "*;q=0.5, br;q=0")[1] == "gzip"
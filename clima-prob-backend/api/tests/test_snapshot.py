@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.cache.tiered import TwoTierCache
+from app.config.settings import settings
+from app.nasa import build, sources
+from app.nasa.resilience import CircuitOpenError
+from app.nasa.snapshot import Snapshot, SnapshotMiss, cell_of, export_from_cache, write_snapshot
+
+def _daily(start="2020-01-01", periods=30, seed=0):
+    idx = pd.date_range(start, periods=periods, freq="D", tz="UTC")
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"Tmax_C": rng.normal(30, 2, periods), "P_mmday": rng.gamma(1, 2, periods)}, index=idx)
+
+def _no_network(*a, **kw):
+    raise AssertionError("network access in offline mode")
+
+def test_snapshot_roundtrip_by_cell(tmp_path):
+    path = str(tmp_path / "a.snap")
+    header = write_snapshot(path, {cell_of(40.41, -3.70): _daily(), cell_of(-33.45, -70.66): _daily(seed=1)})
+    assert len(header["cells"]) == 2
+    snap = Snapshot(path)
+    try:
+        assert snap.covers(40.30, -3.70) and not snap.covers(40.20, -3.70) and not snap.covers(0, 0)
+        pd.testing.assert_frame_equal(snap.frame(40.41, -3.70), _daily(), check_freq=False)
+        with pytest.raises(SnapshotMiss):
+            snap.frame(0, 0)
+    finally:
+        snap.close()
+
+def test_cells_match_gldas_grid():
+    # Centros de celda GLDAS 0.25°: 40.125, 40.375, ...
+    assert cell_of(40.10, -3.70) == cell_of(40.20, -3.70) == (40.125, -3.625)
+    assert cell_of(40.30, -3.70) == (40.375, -3.625)
+
+class _FakeLive(sources.DataSource):
+    name = "live"
+
+    def daily(self, lat, lon, start_iso, end_iso, deadline=None):
+        df = _daily()
+        df.attrs = {"stale": False, "source": self.name}
+        return df
+
+def test_live_dataset_cached_only_on_change(monkeypatch, fresh_cache):
+    monkeypatch.setattr(build, "get_source", _FakeLive)
+    writes = []
+    set_ = fresh_cache.set
+    monkeypatch.setattr(fresh_cache, "set", lambda ns, *a, **kw: (writes.append(ns), set_(ns, *a, **kw)))
+    monkeypatch.setattr(fresh_cache, "get", lambda ns, *a, **kw: (
+        pytest.fail("dataset re-read on a live request") if ns == "dataset" else TwoTierCache.get(fresh_cache, ns, *a, **kw)))
+    for _ in range(3):
+        build.build_dataset(40.41, -3.70, "2020-01-01T00:00:00", "2020-01-30T23:59:59")
+    assert writes == ["dataset", "dataset_digest"]
+
+def test_offline_mode_serves_snapshot_without_network(tmp_path, monkeypatch):
+    path = str(tmp_path / "a.snap")
+    write_snapshot(path, {cell_of(40.41, -3.70): _daily()})
+    monkeypatch.setattr(settings, "OFFLINE_MODE", True)
+    monkeypatch.setattr(settings, "SNAPSHOT_PATH", path)
+    monkeypatch.setattr(sources, "gldas_daily_series", _no_network)
+    monkeypatch.setattr(sources, "imerg_daily_series", _no_network)
+    df = build.build_dataset(40.41, -3.70, "2020-01-05T00:00:00", "2020-01-10T23:59:59")
+    assert len(df) == 6 and df.attrs == {"stale": False, "source": "snapshot"}
+
+def test_export_dumps_cached_datasets(tmp_path, fresh_cache):
+    for start, lat in (("2020-01-01", 40.41), ("2020-01-31", 40.40), ("2020-01-01", 10.0)):
+        df = _daily(start)
+        df.attrs = {"lat": lat, "lon": -3.70}
+        fresh_cache.set("dataset", (lat, -3.70, start), df)
+    path = str(tmp_path / "cache.snap")
+    header = export_from_cache(path, fresh_cache)
+    assert len(header["cells"]) == 2
+    snap = Snapshot(path)
+    try:
+        merged = snap.frame(40.41, -3.70)
+        assert len(merged) == 60 and merged.index.is_monotonic_increasing
+    finally:
+        snap.close()
+
+def test_export_without_shared_cache_fails(tmp_path, fresh_cache):
+    assert fresh_cache.redis is None
+    path = tmp_path / "cache.snap"
+    with pytest.raises(RuntimeError, match="CACHE_URL"):
+        export_from_cache(str(path), fresh_cache)
+    assert not path.exists()
+
+def test_live_outage_falls_back_to_snapshot(tmp_path, monkeypatch):
+    path = str(tmp_path / "a.snap")
+    write_snapshot(path, {cell_of(40.41, -3.70): _daily()})
+    monkeypatch.setattr(settings, "SNAPSHOT_PATH", path)
+
+    def circuit_open(*a, **kw):
+        raise CircuitOpenError("host:giovanni", 30.0)
+
+    monkeypatch.setattr(sources, "gldas_daily_series", circuit_open)
+    df = build.build_dataset(40.41, -3.70, "2020-01-01T00:00:00", "2020-01-30T23:59:59")
+    assert len(df) == 30 and df.attrs["stale"] is True
+    with pytest.raises(CircuitOpenError):
+        build.build_dataset(0, 0, "2020-01-01T00:00:00", "2020-01-30T23:59:59")